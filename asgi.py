@@ -0,0 +1,217 @@
+# asgi.py
+#
+# ASGI serving mode for the Flask app:
+#
+#   uvicorn asgi:app --workers 4
+#
+# Every route of main.app is served unchanged, but requests run on bounded
+# thread pools instead of the event loop: prediction routes on one pool and
+# PDF routes on another, so a burst of report downloads cannot take the
+# threads /predict needs. When a pool's workers and queue are full the request
+# is answered immediately with 503 and a Retry-After header. On shutdown new
+# requests are refused while in-flight ones are allowed to finish.
+
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from main import app as flask_app
+
+# Routes dominated by FPDF rendering; everything else goes to the inference pool.
+REPORT_ROUTES = ('/download_report', '/bulk_reports')
+
+
+class WorkPool:
+    """Thread pool with admission control: workers + max_queue requests at most."""
+
+    def __init__(self, name, workers, max_queue):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"salary-{name}")
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self.in_flight = 0
+        self.rejected = 0
+
+    # Only ever called from the event loop thread, so no lock is needed.
+    def try_acquire(self):
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'capacity': self.capacity,
+            'in_flight': self.in_flight,
+            'queued': max(0, self.in_flight - self.workers),
+            'rejected': self.rejected,
+        }
+
+
+def build_environ(scope, body):
+    """Translates an ASGI HTTP scope and request body into a WSGI environ."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1] if server[1] is not None else 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': str(client[0]),
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    environ.setdefault('CONTENT_LENGTH', str(len(body)))
+    return environ
+
+
+def _start_wsgi(wsgi_app, environ):
+    """Runs the WSGI app up to its first body chunk (on a pool thread)."""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                              for name, value in headers]
+        return lambda data: None
+
+    body = wsgi_app(environ, start_response)
+    chunks = iter(body)
+    first = next(chunks, b'')
+    return started, body, chunks, first
+
+
+class SalaryAsgiApp:
+    """ASGI adapter around the Flask app with per-route bounded pools."""
+
+    def __init__(self, wsgi_app, inference_pool, report_pool, retry_after=1, shutdown_timeout=30.0):
+        self.wsgi_app = wsgi_app
+        self.inference_pool = inference_pool
+        self.report_pool = report_pool
+        self.retry_after = retry_after
+        self.shutdown_timeout = shutdown_timeout
+        self.draining = False
+
+    def pool_for(self, path):
+        return self.report_pool if path.startswith(REPORT_ROUTES) else self.inference_pool
+
+    def stats(self):
+        return {pool.name: pool.stats() for pool in (self.inference_pool, self.report_pool)}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self._drain()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _drain(self):
+        """Refuses new requests and waits for in-flight ones before stopping the pools."""
+        self.draining = True
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.shutdown_timeout
+        pools = (self.inference_pool, self.report_pool)
+        while any(pool.in_flight for pool in pools) and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        for pool in pools:
+            pool.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _reject(self, send, message):
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [(b'content-type', b'text/plain; charset=utf-8'),
+                        (b'retry-after', str(self.retry_after).encode('ascii'))],
+        })
+        await send({'type': 'http.response.body', 'body': message.encode('utf-8')})
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    async def _http(self, scope, receive, send):
+        if self.draining:
+            await self._reject(send, "Server is shutting down.")
+            return
+        pool = self.pool_for(scope['path'])
+        if not pool.try_acquire():
+            await self._reject(send, "Server is busy, please retry shortly.")
+            return
+        try:
+            body = await self._read_body(receive)
+            if body is None:
+                return
+            loop = asyncio.get_running_loop()
+            environ = build_environ(scope, body)
+            started, wsgi_body, chunks, first = await loop.run_in_executor(
+                pool.executor, _start_wsgi, self.wsgi_app, environ)
+            try:
+                await send({'type': 'http.response.start', 'status': started['status'],
+                            'headers': started['headers']})
+                chunk = first
+                while True:
+                    following = await loop.run_in_executor(pool.executor, next, chunks, None)
+                    await send({'type': 'http.response.body', 'body': chunk,
+                                'more_body': following is not None})
+                    if following is None:
+                        break
+                    chunk = following
+            finally:
+                if hasattr(wsgi_body, 'close'):
+                    await loop.run_in_executor(pool.executor, wsgi_body.close)
+        finally:
+            pool.release()
+
+
+app = SalaryAsgiApp(
+    flask_app,
+    inference_pool=WorkPool('inference',
+                            workers=int(os.environ.get('SALARY_ASGI_INFERENCE_THREADS', 8)),
+                            max_queue=int(os.environ.get('SALARY_ASGI_INFERENCE_QUEUE', 64))),
+    report_pool=WorkPool('reports',
+                         workers=int(os.environ.get('SALARY_ASGI_REPORT_THREADS', 2)),
+                         max_queue=int(os.environ.get('SALARY_ASGI_REPORT_QUEUE', 8))),
+    retry_after=int(os.environ.get('SALARY_ASGI_RETRY_AFTER', 1)),
+    shutdown_timeout=float(os.environ.get('SALARY_ASGI_SHUTDOWN_TIMEOUT', 30)),
+)
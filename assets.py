@@ -0,0 +1,354 @@
+# assets.py
+#
+# Everything a request needs from the trained artifacts, loaded as one unit.
+#
+# Loading is lazy by default: each worker unpickles on its first request. Set
+# SALARY_PRELOAD=1 (or run `python main.py --preload`, or `gunicorn --preload`
+# with SALARY_PRELOAD=1) to load once at import time, i.e. in the master
+# before fork. With SALARY_MMAP_DIR set, the flattened forest is stored
+# uncompressed in that directory and opened with mmap_mode='r', so every
+# worker shares the same pages through the OS page cache instead of holding
+# its own unpickled copy of the forest.
+#
+# With a pickle-free artifact exported by model_artifact.py (SALARY_ARTIFACT_PATH,
+# default salary_model.npz) the pickles are not read at all: the forest and the
+# vocabularies come from the .npz, and neither sklearn nor joblib is imported.
+
+import os
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+from batching import MicroBatcher
+from caching import PredictionCache
+from encoding import FeatureEncoder
+from inference import ForestEngine, summarize_trees, unwrap_forest
+from model_artifact import load_artifact
+from prediction_grid import PredictionGrid, asset_hashes, grid_columns
+
+# --- Filenames ---
+MODEL_FILENAME = 'salary_model.pkl'
+SCALER_FILENAME = 'scaler1.pkl'
+LABEL_ENCODERS_FILENAME = 'label_encoders.pkl'
+MMAP_ENGINE_FILENAME = 'forest_engine.joblib'
+
+# Column order the scaler and model were fitted on.
+FEATURE_COLUMNS = ['Age', 'Gender', 'Education Level', 'Job Title', 'Years of Experience']
+
+USD_TO_INR = 83.3
+
+# Above this many rows sklearn's compiled traversal is faster than the NumPy engine.
+ENGINE_MAX_ROWS = 2048
+
+# Prediction intervals: these quantiles of the per-tree predictions (an 80% range).
+INTERVAL_QUANTILES = (0.1, 0.9)
+
+
+def load_asset(filename, mmap_mode=None):
+    if os.path.exists(filename):
+        print(f"✅ Loading {filename}...")
+        # Imported here so the artifact-only path never pays for joblib.
+        import joblib
+        return joblib.load(filename, mmap_mode=mmap_mode)
+    else:
+        print(f"🚨 WARNING: File not found - {filename}.")
+        return None
+
+
+def resident_memory_mb():
+    """Returns this process's current resident set size in MB."""
+    try:
+        with open('/proc/self/statm') as handle:
+            resident_pages = int(handle.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is the peak, in KB on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_engine(model, scaler):
+    """Flattens the forest with the scaler folded into its thresholds."""
+    if model is None or scaler is None:
+        return None
+    try:
+        return ForestEngine.from_sklearn(model, scaler)
+    except ValueError as e:
+        print(f"🚨 WARNING: Fused inference engine unavailable ({e}); using sklearn.")
+        return None
+
+
+def load_mmap_engine(mmap_dir, hashes, model_filename, scaler):
+    """Opens the shared memory-mapped engine, writing it first if missing or stale."""
+    import joblib
+    path = os.path.join(mmap_dir, MMAP_ENGINE_FILENAME)
+    if os.path.exists(path):
+        stored = joblib.load(path, mmap_mode='r')
+        if stored.get('hashes') == hashes:
+            return stored['engine']
+        print(f"🚨 WARNING: {path} was built from other assets; rebuilding.")
+
+    model = load_asset(model_filename)
+    engine = load_engine(model, scaler)
+    if engine is None:
+        return None
+    os.makedirs(mmap_dir, exist_ok=True)
+    # Uncompressed so the arrays can be memory-mapped; os.replace keeps
+    # concurrently starting workers from reading a half-written file.
+    partial = f"{path}.{os.getpid()}.tmp"
+    joblib.dump({'hashes': hashes, 'engine': engine}, partial, compress=0)
+    os.replace(partial, path)
+    return joblib.load(path, mmap_mode='r')['engine']
+
+
+def load_engine_artifact(filename):
+    """Returns (engine, meta) from a pickle-free artifact, or (None, None)."""
+    if not filename or not os.path.exists(filename):
+        return None, None
+    try:
+        engine, meta = load_artifact(filename)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        print(f"🚨 WARNING: Ignoring model artifact {filename}: {e}")
+        return None, None
+    if meta['feature_columns'] != FEATURE_COLUMNS:
+        print(f"🚨 WARNING: Ignoring model artifact {filename}: unexpected feature columns.")
+        return None, None
+    print(f"✅ Loading {filename}...")
+    return engine, meta
+
+
+def load_grid(filename, hashes):
+    if not filename or not os.path.exists(filename):
+        return None
+    try:
+        grid = PredictionGrid.load(filename, hashes)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"🚨 WARNING: Ignoring prediction grid {filename}: {e}")
+        return None
+    if grid.columns != grid_columns(INTERVAL_QUANTILES, FEATURE_COLUMNS):
+        print(f"🚨 WARNING: Ignoring prediction grid {filename}: built for other interval quantiles; rebuild it.")
+        return None
+    print(f"✅ Loading {filename}...")
+    return grid
+
+
+def cache_namespace(hashes):
+    # Cached values are explain_usd() rows, so the interval quantiles are part of the key.
+    quantiles = ','.join(f"{q:g}" for q in INTERVAL_QUANTILES)
+    return f"{hashes['model'][:16]}:{quantiles}:explained:" if hashes else ''
+
+
+def model_version(hashes):
+    """Short identifier of a model version: the start of its model file hash."""
+    return hashes['model'][:12] if hashes else 'unknown'
+
+
+class SalaryAssets:
+    """Model, scaler, encoders and the fast paths derived from them."""
+
+    def __init__(self, model, scaler, label_encoders, engine=None, grid=None, cache=None,
+                 batch_size=1, batch_wait_ms=0.0, feature_encoder=None, hashes=None):
+        self.model = model
+        self.scaler = scaler
+        self.label_encoders = label_encoders
+        self.engine = engine
+        self.grid = grid
+        # SHA-256 of the files this version was loaded from; identifies the model version.
+        self.hashes = hashes
+        self.cache = cache if cache is not None else PredictionCache(maxsize=0)
+        # Coalesces concurrent grid and cache misses into one model call.
+        self.batcher = MicroBatcher(self._explain_model_usd, max_batch=batch_size, max_wait_ms=batch_wait_ms)
+        if engine is not None:
+            # Built here so the first explained request does not pay for it.
+            engine.contribution_table()
+        # Lookup tables replacing per-request LabelEncoder.transform calls.
+        if feature_encoder is None and label_encoders:
+            feature_encoder = FeatureEncoder.from_label_encoders(label_encoders)
+        self.feature_encoder = feature_encoder
+        # Set by the registry when this version fails its checks; it is then never served.
+        self.rejected = None
+
+    @property
+    def baseline_usd(self):
+        """The forest's prediction before any split; explanations are relative to it."""
+        return self.engine.bias if self.engine is not None else float('nan')
+
+    @property
+    def ready(self):
+        # The engine has the scaler folded in; the sklearn model needs it separately.
+        can_predict = self.engine is not None or (self.model is not None and self.scaler is not None)
+        return can_predict and self.feature_encoder is not None and self.rejected is None
+
+    @classmethod
+    def load(cls, model_filename=MODEL_FILENAME, scaler_filename=SCALER_FILENAME,
+             encoders_filename=LABEL_ENCODERS_FILENAME, mmap_dir=None, grid_filename=None,
+             cache_size=4096, cache_path=None, batch_size=1, batch_wait_ms=0.0, artifact_filename=None):
+        paths = (model_filename, scaler_filename, encoders_filename)
+        hashes = asset_hashes(*paths) if all(os.path.exists(path) for path in paths) else None
+
+        engine, meta = load_engine_artifact(artifact_filename)
+        if engine is not None and hashes and meta.get('hashes') != hashes:
+            # The pickles were replaced (a retrain) after the artifact was exported.
+            print(f"🚨 WARNING: {artifact_filename} was exported from other model files; loading the pickles.")
+            engine = None
+        if engine is not None:
+            hashes = meta.get('hashes')
+            return cls(
+                None, None, None, engine=engine,
+                grid=load_grid(grid_filename, hashes) if hashes else None,
+                cache=PredictionCache(maxsize=cache_size, shared_path=cache_path, namespace=cache_namespace(hashes)),
+                batch_size=batch_size, batch_wait_ms=batch_wait_ms,
+                feature_encoder=FeatureEncoder(meta['vocabularies']), hashes=hashes,
+            )
+
+        scaler = load_asset(scaler_filename)
+        label_encoders = load_asset(encoders_filename)
+
+        model = engine = None
+        if mmap_dir and hashes and scaler is not None:
+            engine = load_mmap_engine(mmap_dir, hashes, model_filename, scaler)
+        if engine is None:
+            model = load_asset(model_filename)
+            engine = load_engine(model, scaler)
+
+        return cls(
+            model, scaler, label_encoders, engine=engine,
+            grid=load_grid(grid_filename, hashes) if hashes else None,
+            cache=PredictionCache(maxsize=cache_size, shared_path=cache_path, namespace=cache_namespace(hashes)),
+            batch_size=batch_size, batch_wait_ms=batch_wait_ms, hashes=hashes,
+        )
+
+    # --- Prediction ---
+
+    def build_feature_matrix(self, records):
+        """Encodes a list of profile dicts into the model's (n, 5) feature matrix, one vectorized pass per column."""
+        features = np.empty((len(records), len(FEATURE_COLUMNS)), dtype=np.float64)
+        for j, column in enumerate(FEATURE_COLUMNS):
+            values = [record.get(column) for record in records]
+            if column in self.feature_encoder:
+                features[:, j] = self.feature_encoder.encode_many(column, values)
+            else:
+                features[:, j] = np.asarray(values, dtype=np.float64)
+        return features
+
+    def _from_grid(self, input_features, columns, compute, explain=False):
+        """Takes the given grid columns for in-grid rows and computes the rest."""
+        input_features = np.asarray(input_features, dtype=np.float64)
+        if self.grid is None:
+            return compute(input_features)
+        values, in_grid = self.grid.lookup_many(input_features, explain)
+        values = values[:, columns]
+        if not in_grid.all():
+            values[~in_grid] = compute(input_features[~in_grid])
+        return values
+
+    def predict_usd(self, input_features):
+        """Predicts USD salaries for raw (unscaled) feature rows."""
+        return self._from_grid(input_features, 0, self.predict_model_usd)
+
+    def predict_model_usd(self, input_features):
+        """Runs the live model on raw (unscaled) feature rows."""
+        return self._predict_distinct(input_features, self._predict_rows)
+
+    def predict_interval_usd(self, input_features):
+        """Returns an (n, 3) array of [prediction, low, high] USD for raw feature rows.
+
+        low/high are INTERVAL_QUANTILES of the individual trees' predictions,
+        computed in the same pass as the prediction itself; they are NaN when
+        the model is not a forest.
+        """
+        return self._from_grid(input_features, slice(0, 1 + len(INTERVAL_QUANTILES)),
+                               lambda rows: self._predict_distinct(rows, self._predict_interval_rows))
+
+    @staticmethod
+    def _predict_distinct(input_features, predict_rows):
+        input_features = np.asarray(input_features, dtype=np.float64)
+        if len(input_features) > ENGINE_MAX_ROWS and np.isfinite(input_features).all():
+            # Large extracts repeat many profiles; predict each distinct row once.
+            unique_rows, inverse = np.unique(input_features, axis=0, return_inverse=True)
+            if len(unique_rows) <= len(input_features) // 2:
+                return predict_rows(unique_rows)[inverse.reshape(-1)]
+        return predict_rows(input_features)
+
+    def _predict_rows(self, input_features):
+        if self.engine is not None and (self.model is None or len(input_features) <= ENGINE_MAX_ROWS):
+            return self.engine.predict(input_features)
+        return self.model.predict(self.scaler.transform(input_features))
+
+    def _predict_interval_rows(self, input_features):
+        if self.engine is not None and (self.model is None or len(input_features) <= ENGINE_MAX_ROWS):
+            return self.engine.predict_quantiles(input_features, INTERVAL_QUANTILES)
+        scaled = self.scaler.transform(input_features)
+        forest = self._forest()
+        if forest is None:
+            predicted = self.model.predict(scaled)
+            return np.column_stack([predicted] + [np.full(len(predicted), np.nan)] * len(INTERVAL_QUANTILES))
+        # The trees read float32 features; converting once spares each tree a copy.
+        scaled = np.asarray(scaled, dtype=np.float32)
+        per_tree = np.stack([tree.predict(scaled) for tree in forest.estimators_])
+        return summarize_trees(per_tree, INTERVAL_QUANTILES)
+
+    def _forest(self):
+        try:
+            return unwrap_forest(self.model)
+        except ValueError:
+            return None
+
+    def explain_usd(self, input_features):
+        """Returns an (n, 3 + 5) array: [prediction, low, high], then one contribution per FEATURE_COLUMNS.
+
+        Contributions are USD amounts that add up to prediction - baseline_usd.
+        They come from the same tree traversal as the prediction, so explaining
+        a batch costs about as much as predicting it; in-grid rows are read
+        from the grid, whose contributions are stored as float32. NaN when the
+        forest engine is unavailable.
+        """
+        return self._from_grid(input_features, slice(None), self._explain_model_usd, explain=True)
+
+    def _explain_model_usd(self, input_features):
+        if self.engine is None:
+            predicted = self._predict_distinct(input_features, self._predict_interval_rows)
+            return np.column_stack([predicted, np.full((len(predicted), len(FEATURE_COLUMNS)), np.nan)])
+        return self._predict_distinct(input_features, lambda rows: self.engine.explain(rows, INTERVAL_QUANTILES))
+
+    def explain_one_usd(self, features):
+        """Returns one explain_usd() row as a tuple: from the grid, else through the cache and micro-batcher."""
+        if self.grid is not None:
+            explained = self.grid.lookup(features, explain=True)
+            if explained is not None:
+                return explained
+        return tuple(self.cache.get_or_compute(features, self.batcher.predict))
+
+
+class LazyAssets:
+    """Loads SalaryAssets on first use, once per process, and reports the cost."""
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._assets = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._assets is not None
+
+    def get(self):
+        assets = self._assets
+        if assets is None:
+            with self._lock:
+                if self._assets is None:
+                    self._assets = self._load()
+                assets = self._assets
+        return assets
+
+    def preload(self):
+        return self.get()
+
+    def _load(self):
+        started = time.perf_counter()
+        assets = self._loader()
+        print(f"✅ Assets ready in {time.perf_counter() - started:.2f}s "
+              f"(pid {os.getpid()}, RSS {resident_memory_mb():.1f} MB)")
+        return assets
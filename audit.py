@@ -0,0 +1,312 @@
+# audit.py
+#
+# Compliance log of every prediction: the inputs, the encoded features, the
+# model version and the output. Request threads only append a tuple to a
+# bounded in-memory buffer; a background thread writes the buffer in batches
+# (one transaction each) to append-only SQLite files in WAL mode, one file
+# per UTC day, so no request ever waits on disk.
+#
+# When the buffer is full the policy decides: 'drop' (default) discards the
+# new entry and counts it, 'block' makes the request wait for the writer.
+#
+#   python audit.py query --dir audit --from 2026-01-01 --to 2026-03-31 --job-title "Data Scientist"
+#   python audit.py query --dir audit --from 2026-01-01 --summary
+
+import argparse
+import collections
+import csv
+import datetime
+import glob
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+COLUMNS = [
+    ('ts', 'REAL'),
+    ('route', 'TEXT'),
+    ('model_version', 'TEXT'),
+    ('age', 'REAL'),
+    ('gender', 'TEXT'),
+    ('education_level', 'TEXT'),
+    ('job_title', 'TEXT'),
+    ('years_of_experience', 'REAL'),
+    ('gender_code', 'INTEGER'),
+    ('education_code', 'INTEGER'),
+    ('job_title_code', 'INTEGER'),
+    ('predicted_usd', 'REAL'),
+    ('low_usd', 'REAL'),
+    ('high_usd', 'REAL'),
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+FILE_PREFIX = 'audit-'
+FILE_SUFFIX = '.sqlite'
+POLICIES = ('drop', 'block')
+
+
+def day_path(directory, day):
+    return os.path.join(directory, f"{FILE_PREFIX}{day}{FILE_SUFFIX}")
+
+
+def open_day(path):
+    conn = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+    # WAL lets the query CLI read while workers append; NORMAL only risks the
+    # last transactions on power loss, never corruption.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    columns = ', '.join(f"{name} {kind}" for name, kind in COLUMNS)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS predictions ({columns})")
+    conn.execute("CREATE INDEX IF NOT EXISTS predictions_job_title ON predictions (job_title)")
+    return conn
+
+
+def _nan_to_none(value):
+    value = float(value)
+    return None if value != value else value
+
+
+class AuditLog:
+    """Buffers prediction records in memory and appends them to daily SQLite files."""
+
+    def __init__(self, directory, capacity=50000, policy='drop', batch_rows=1000, flush_interval=1.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown audit buffer policy '{policy}' (expected one of {', '.join(POLICIES)}).")
+        self.directory = directory
+        self.capacity = capacity
+        self.policy = policy
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._thread = None
+        self._pid = None
+        self._closing = False
+        self._connections = {}
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.flushes = 0
+        self.write_errors = 0
+        self.last_error = None
+
+    # --- Request side ---
+
+    def record(self, route, model_version, profile, features, output):
+        """Queues one prediction: the profile dict, its encoded row and (prediction, low, high) USD."""
+        self._put([self._entry(time.time(), route, model_version, profile, features, output)])
+
+    def record_many(self, route, model_version, profiles, features, outputs):
+        """Queues a batch of predictions with one timestamp."""
+        now = time.time()
+        self._put([self._entry(now, route, model_version, profile, row, output)
+                   for profile, row, output in zip(profiles, features, outputs)])
+
+    @staticmethod
+    def _entry(ts, route, model_version, profile, features, output):
+        return (
+            ts, route, model_version,
+            _nan_to_none(features[0]), str(profile.get('Gender')), str(profile.get('Education Level')),
+            str(profile.get('Job Title')), _nan_to_none(features[4]),
+            int(features[1]), int(features[2]), int(features[3]),
+            _nan_to_none(output[0]), _nan_to_none(output[1]), _nan_to_none(output[2]),
+        )
+
+    def _put(self, entries):
+        with self._lock:
+            self._ensure_writer()
+            for entry in entries:
+                if len(self._buffer) >= self.capacity:
+                    if self.policy == 'drop':
+                        self.dropped += 1
+                        continue
+                    self.blocked += 1
+                    while len(self._buffer) >= self.capacity and not self._closing:
+                        self._not_full.wait()
+                self._buffer.append(entry)
+                self.recorded += 1
+            if len(self._buffer) >= self.batch_rows:
+                self._not_empty.notify()
+
+    def _ensure_writer(self):
+        # The writer thread does not survive a fork, so each process starts its
+        # own on first use. Called with the lock held.
+        if self._thread is None or self._pid != os.getpid():
+            if self._pid != os.getpid():
+                # Entries inherited from the parent are the parent's to write.
+                self._buffer.clear()
+                self._connections = {}
+            self._pid = os.getpid()
+            self._closing = False
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._write_loop, name='salary-audit', daemon=True)
+            self._thread.start()
+
+    # --- Writer side ---
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                if len(self._buffer) < self.batch_rows and not self._closing:
+                    self._not_empty.wait(self.flush_interval)
+                batch = [self._buffer.popleft() for _ in range(min(len(self._buffer), self.batch_rows))]
+                closing = self._closing and not self._buffer
+                self._not_full.notify_all()
+            if batch:
+                self._write(batch)
+            if closing:
+                return
+
+    def _write(self, batch):
+        by_day = collections.defaultdict(list)
+        for entry in batch:
+            day = datetime.datetime.fromtimestamp(entry[0], datetime.timezone.utc).strftime('%Y-%m-%d')
+            by_day[day].append(entry)
+        placeholders = ', '.join('?' for _ in COLUMNS)
+        for day, entries in by_day.items():
+            try:
+                conn = self._connection(day)
+                with conn:
+                    conn.execute("BEGIN")
+                    conn.executemany(f"INSERT INTO predictions VALUES ({placeholders})", entries)
+                self.written += len(entries)
+            except sqlite3.Error as e:
+                # Never take the server down over the log; the failure shows in stats().
+                self.write_errors += len(entries)
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"🚨 WARNING: Could not write {len(entries)} audit records: {e}")
+        self.flushes += 1
+
+    def _connection(self, day):
+        conn = self._connections.get(day)
+        if conn is None:
+            # Rotating to a new day closes the previous day's file.
+            for stale in self._connections.values():
+                stale.close()
+            conn = open_day(day_path(self.directory, day))
+            self._connections = {day: conn}
+        return conn
+
+    def close(self, timeout=10.0):
+        """Writes everything still buffered and stops the writer."""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._closing = True
+            self._not_empty.notify()
+            self._not_full.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        with self._lock:
+            self._thread = None
+
+    def stats(self):
+        return {
+            'policy': self.policy,
+            'capacity': self.capacity,
+            'buffered': len(self._buffer),
+            'recorded': self.recorded,
+            'written': self.written,
+            'dropped': self.dropped,
+            'blocked': self.blocked,
+            'flushes': self.flushes,
+            'write_errors': self.write_errors,
+        }
+
+
+# --- Query CLI ---
+
+def day_files(directory, start=None, end=None):
+    """Daily audit files between two YYYY-MM-DD dates (inclusive), oldest first."""
+    files = []
+    for path in sorted(glob.glob(os.path.join(directory, f"{FILE_PREFIX}*{FILE_SUFFIX}"))):
+        day = os.path.basename(path)[len(FILE_PREFIX):-len(FILE_SUFFIX)]
+        if (start is None or day >= start) and (end is None or day <= end):
+            files.append(path)
+    return files
+
+
+def query(directory, start=None, end=None, job_title=None):
+    """Yields matching records as tuples in COLUMN_NAMES order.
+
+    Only the files for the requested days are opened, and the job title filter
+    uses each file's index, so a title across months reads only its rows.
+    """
+    sql = f"SELECT {', '.join(COLUMN_NAMES)} FROM predictions"
+    params = ()
+    if job_title is not None:
+        sql += " WHERE job_title = ?"
+        params = (job_title,)
+    for path in day_files(directory, start, end):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5.0)
+        try:
+            yield from conn.execute(sql + " ORDER BY rowid", params)
+        finally:
+            conn.close()
+
+
+def summarize(directory, start=None, end=None, job_title=None):
+    """Per-day, per-job-title prediction counts and mean/min/max USD, aggregated inside SQLite."""
+    sql = ("SELECT job_title, COUNT(*), AVG(predicted_usd), MIN(predicted_usd), MAX(predicted_usd) "
+           "FROM predictions")
+    params = ()
+    if job_title is not None:
+        sql += " WHERE job_title = ?"
+        params = (job_title,)
+    sql += " GROUP BY job_title ORDER BY job_title"
+    for path in day_files(directory, start, end):
+        day = os.path.basename(path)[len(FILE_PREFIX):-len(FILE_SUFFIX)]
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5.0)
+        try:
+            for row in conn.execute(sql, params):
+                yield (day,) + row
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the prediction audit log.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    query_parser = subparsers.add_parser('query', help="Export or summarize audit records as CSV")
+    query_parser.add_argument('--dir', default=os.environ.get('SALARY_AUDIT_DIR', 'audit'))
+    query_parser.add_argument('--from', dest='start', help="First day, YYYY-MM-DD (UTC)")
+    query_parser.add_argument('--to', dest='end', help="Last day, YYYY-MM-DD (UTC)")
+    query_parser.add_argument('--job-title', default=None)
+    query_parser.add_argument('--summary', action='store_true',
+                              help="Counts and mean/min/max prediction per day and job title instead of records")
+    query_parser.add_argument('-o', '--output', default=None, help="CSV path (default: stdout)")
+    args = parser.parse_args()
+
+    for day in (args.start, args.end):
+        if day is not None:
+            try:
+                datetime.date.fromisoformat(day)
+            except ValueError:
+                parser.error(f"invalid date '{day}', expected YYYY-MM-DD")
+
+    started = time.perf_counter()
+    handle = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.writer(handle)
+        if args.summary:
+            writer.writerow(['day', 'job_title', 'count', 'mean_usd', 'min_usd', 'max_usd'])
+            rows = summarize(args.dir, args.start, args.end, args.job_title)
+        else:
+            writer.writerow(COLUMN_NAMES)
+            rows = query(args.dir, args.start, args.end, args.job_title)
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    finally:
+        if args.output:
+            handle.close()
+    print(f"✅ {count:,} rows from {len(day_files(args.dir, args.start, args.end))} daily files "
+          f"in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
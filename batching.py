@@ -0,0 +1,143 @@
+# batching.py
+#
+# Coalesces concurrent single-row predictions into one vectorized call.
+# Request threads hand their feature row to a MicroBatcher and block on a
+# future; one collector thread gathers rows for up to max_wait_ms (or until
+# max_batch rows are waiting), runs them through predict_many in a single
+# call and hands each caller its own value.
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def _as_result(value):
+    """One row of predict_many's output as a float, or a tuple of floats."""
+    if np.ndim(value) == 0:
+        return float(value)
+    return tuple(float(part) for part in value)
+
+
+class MicroBatcher:
+    """Groups single-row predictions from many threads into batched calls.
+
+    predict_many takes an (n, k) float64 array and returns n values, or an
+    (n, m) array whose rows are handed back as tuples. With max_batch <= 1
+    batching is off and predict() calls it directly.
+    """
+
+    def __init__(self, predict_many, max_batch=64, max_wait_ms=2.0):
+        self.predict_many = predict_many
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.longest_wait_ms = 0.0
+        self.failed_batches = 0
+
+    @property
+    def enabled(self):
+        return self.max_batch > 1
+
+    def predict(self, row):
+        """Returns the prediction for one feature row, batched with concurrent callers."""
+        if not self.enabled:
+            return _as_result(self.predict_many(np.asarray([row], dtype=np.float64))[0])
+        future = Future()
+        with self._lock:
+            self._ensure_collector()
+            self._queue.put((np.asarray(row, dtype=np.float64), time.perf_counter(), future))
+        return future.result()
+
+    def _ensure_collector(self):
+        # The collector thread does not survive a fork (gunicorn --preload),
+        # so each process starts its own on first use. Called with the lock held.
+        if self._thread is None or self._pid != os.getpid():
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._collect, args=(self._queue,),
+                                            name='salary-batcher', daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stops the collector after the rows already queued; later calls start a new one."""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                self._queue.put(None)
+            self._thread = None
+
+    def _take_batch(self, jobs):
+        first = jobs.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = jobs.get(timeout=remaining) if remaining > 0 else jobs.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop.
+                jobs.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _collect(self, jobs):
+        # Bound to the queue it was started with, so a closed collector never
+        # takes rows from its replacement.
+        while True:
+            batch = self._take_batch(jobs)
+            if batch is None:
+                return
+            started = time.perf_counter()
+            rows = np.vstack([row for row, _, _ in batch])
+            try:
+                values = self.predict_many(rows)
+            except Exception:
+                # One bad row must not fail its neighbours: retry them one by one.
+                self.failed_batches += 1
+                for row, _, future in batch:
+                    self._run_single(row, future)
+            else:
+                for (_, _, future), value in zip(batch, values):
+                    future.set_result(_as_result(value))
+            self._record(batch, started)
+
+    def _run_single(self, row, future):
+        try:
+            future.set_result(_as_result(self.predict_many(row.reshape(1, -1))[0]))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _record(self, batch, started):
+        self.batches += 1
+        self.rows += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        oldest = min(enqueued for _, enqueued, _ in batch)
+        self.longest_wait_ms = max(self.longest_wait_ms, (started - oldest) * 1000.0)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': self._queue.qsize(),
+            'batches': self.batches,
+            'rows': self.rows,
+            'mean_batch': self.rows / self.batches if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'longest_wait_ms': round(self.longest_wait_ms, 3),
+            'failed_batches': self.failed_batches,
+        }
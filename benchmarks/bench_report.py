@@ -0,0 +1,88 @@
+# bench_report.py
+#
+# PDF report render benchmark: PDFs per second and p50/p99 latency for the
+# template renderer, against a baseline that redraws the whole layout for
+# every report (what download_report() used to do).
+#
+#   python benchmarks/bench_report.py --reports 500
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report import ReportRenderer, build_template, fill_report  # noqa: E402
+
+SAMPLE_REPORT = {
+    "prediction": "₹ 58.73 Lakhs p.a.",
+    "age": "32",
+    "gender": "Male",
+    "education": "Bachelor's",
+    "job_title": "Software Engineer",
+    "experience": "5",
+    "country": "India",
+    "industry": "Information Technology",
+    "company_size": "1000-5000",
+    "employment_type": "Full-time",
+    "remote": "Hybrid",
+    "skills": "Python, SQL, Machine Learning, Flask, Docker, Communication",
+    "certifications": "AWS Certified Solutions Architect",
+    "relocate": "Yes",
+    "user_name": "Asha",
+    "user_location": "Pune",
+}
+
+
+def sample_reports(count):
+    # Distinct names so the cached renderer cannot serve them from memory.
+    return [dict(SAMPLE_REPORT, user_name=f"Employee {i}") for i in range(count)]
+
+
+def measure(render, reports, warmup=20):
+    for report_data in reports[:warmup]:
+        render(report_data)
+    latencies = np.empty(len(reports))
+    started = time.perf_counter()
+    for i, report_data in enumerate(reports):
+        t0 = time.perf_counter()
+        render(report_data)
+        latencies[i] = time.perf_counter() - t0
+    elapsed = time.perf_counter() - started
+    return {
+        'pdfs_per_second': len(reports) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+    }
+
+
+def run(count):
+    reports = sample_reports(count)
+    template_renderer = ReportRenderer(cache_bytes=0)
+    cached_renderer = ReportRenderer()
+    cached_renderer.render(reports[0])
+    return {
+        'baseline (full redraw)': measure(lambda data: fill_report(build_template(), data), reports),
+        'template': measure(template_renderer.render_uncached, reports),
+        'cache hit': measure(lambda data: cached_renderer.render(reports[0]), reports),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF report rendering.")
+    parser.add_argument('--reports', type=int, default=500)
+    args = parser.parse_args()
+
+    results = run(args.reports)
+    baseline = results['baseline (full redraw)']['pdfs_per_second']
+    print(f"{'renderer':<24}{'PDFs/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'speedup':>10}")
+    for name, stats in results.items():
+        print(f"{name:<24}{stats['pdfs_per_second']:>10.1f}{stats['p50_ms']:>10.3f}"
+              f"{stats['p99_ms']:>10.3f}{stats['pdfs_per_second'] / baseline:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
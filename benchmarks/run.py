@@ -0,0 +1,355 @@
+# run.py
+#
+# Load-test suite for the serving paths. Drives the Flask app in-process
+# (test client) and over a local socket (threaded werkzeug server) with
+# profiles drawn from the label encoder vocabularies, and reports throughput,
+# p50/p95/p99 latency, error counts and RSS growth per scenario. Scenarios
+# whose page template is missing are skipped with a warning.
+#
+#   python benchmarks/run.py                       # run, save JSON, compare with baseline
+#   python benchmarks/run.py --save-baseline       # record this machine's baseline
+#   python benchmarks/run.py --scenarios predict predict_batch --mode socket
+#
+# Exits with status 1 when a scenario regresses past the tolerances against
+# benchmarks/baseline.json, so it can gate changes to main.py or a retrained
+# salary_model.pkl. A run with failed requests also exits with status 1 and is
+# never saved as the baseline.
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import joblib  # noqa: E402
+
+from prediction_grid import asset_hashes  # noqa: E402
+
+BENCH_DIR = os.path.join(ROOT, 'benchmarks')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'latest.json')
+
+REPORT_EXTRAS = {
+    'country': ['India', 'United States', 'United Kingdom', 'Germany', 'Canada'],
+    'industry': ['Information Technology', 'Finance', 'Healthcare', 'Education', 'Retail'],
+    'company_size': ['1-50', '50-200', '200-1000', '1000-5000', '5000+'],
+    'employment_type': ['Full-time', 'Part-time', 'Contract'],
+    'remote': ['On-site', 'Hybrid', 'Remote'],
+    'relocate': ['Yes', 'No'],
+}
+
+
+class ProfileMix:
+    """Reproducible stream of realistic profiles from the encoder vocabularies."""
+
+    def __init__(self, encoders_path, seed=42):
+        label_encoders = joblib.load(encoders_path)
+        self.vocabularies = {column: [str(value) for value in encoder.classes_]
+                             for column, encoder in label_encoders.items()}
+        self.rng = random.Random(seed)
+
+    def profile(self):
+        age = self.rng.randint(21, 62)
+        experience = round(self.rng.uniform(0, max(0.0, age - 21)) * 2) / 2
+        return {
+            'Age': str(age),
+            'Gender': self.rng.choice(self.vocabularies['Gender']),
+            'Education Level': self.rng.choice(self.vocabularies['Education Level']),
+            'Job Title': self.rng.choice(self.vocabularies['Job Title']),
+            'Years of Experience': str(experience),
+        }
+
+    def report_args(self):
+        profile = self.profile()
+        args = {
+            'prediction': f"₹ {self.rng.uniform(3, 60):.2f} Lakhs p.a.",
+            'age': profile['Age'],
+            'gender': profile['Gender'],
+            'education': profile['Education Level'],
+            'job_title': profile['Job Title'],
+            'experience': profile['Years of Experience'],
+            'skills': 'Python, SQL, Communication',
+            'certifications': 'N/A',
+            'userName': f"Employee {self.rng.randint(1, 100000)}",
+            'userLocation': 'Pune',
+        }
+        args.update({key: self.rng.choice(values) for key, values in REPORT_EXTRAS.items()})
+        return args
+
+
+# (method, path, body, content type) for each scenario; built up front so input
+# generation is not part of the measured time.
+def build_requests(scenario, mix, count, batch_size):
+    requests = []
+    for _ in range(count):
+        if scenario == 'predict':
+            requests.append(('POST', '/predict', urlencode(mix.profile()).encode(),
+                             'application/x-www-form-urlencoded'))
+        elif scenario == 'predict_form':
+            requests.append(('GET', '/predict_form', b'', None))
+        elif scenario == 'download_report':
+            requests.append(('GET', f"/download_report?{urlencode(mix.report_args())}", b'', None))
+        elif scenario == 'predict_batch':
+            body = json.dumps([mix.profile() for _ in range(batch_size)]).encode()
+            requests.append(('POST', '/predict_batch', body, 'application/json'))
+        elif scenario == 'bulk_reports':
+            body = json.dumps([mix.profile() for _ in range(batch_size // 10 or 1)]).encode()
+            requests.append(('POST', '/bulk_reports', body, 'application/json'))
+        else:
+            raise ValueError(f"unknown scenario {scenario!r}")
+    return requests
+
+
+SCENARIOS = ['predict', 'predict_form', 'download_report', 'predict_batch', 'bulk_reports']
+
+# Expensive scenarios run fewer requests than --requests.
+REQUEST_SHARE = {'bulk_reports': 0.05, 'predict_batch': 0.25}
+
+# Scenarios whose route renders a page template.
+SCENARIO_TEMPLATES = {'predict': 'predict_form.html', 'predict_form': 'predict_form.html'}
+
+
+def peak_rss_mb():
+    """Peak RSS of this process so far (it never goes down between scenarios)."""
+    # ru_maxrss is in KB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def renderable_scenarios(app, scenarios):
+    """Leaves out the scenarios whose page template is missing; they could only time 500 pages."""
+    from jinja2 import TemplateNotFound
+    kept = []
+    for scenario in scenarios:
+        template = SCENARIO_TEMPLATES.get(scenario)
+        if template is not None:
+            try:
+                app.jinja_env.get_template(template)
+            except TemplateNotFound:
+                print(f"🚨 WARNING: Skipping {scenario}: template {template} not found, so the route can only fail.")
+                continue
+        kept.append(scenario)
+    return kept
+
+
+class InProcessClient:
+    """Sends requests through Flask's test client (one per thread)."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def send(self, method, path, body, content_type):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        headers = {'Content-Type': content_type} if content_type else {}
+        response = client.open(path, method=method, data=body, headers=headers)
+        response.get_data()
+        return response.status_code
+
+
+class SocketClient:
+    """Sends requests over keep-alive HTTP connections to a local threaded server."""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        self._local = threading.local()
+
+    def send(self, method, path, body, content_type):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        headers = {'Content-Type': content_type} if content_type else {}
+        try:
+            connection.request(method, path, body=body or None, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            raise
+        if response.getheader('Connection', '').lower() == 'close':
+            connection.close()
+            self._local.connection = None
+        return response.status
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_scenario(client, requests, concurrency, warmup_requests=()):
+    for request in warmup_requests:
+        client.send(*request)
+    peak_before = peak_rss_mb()
+    latencies = np.empty(len(requests))
+    statuses = [0] * len(requests)
+
+    def timed(index):
+        t0 = time.perf_counter()
+        try:
+            statuses[index] = client.send(*requests[index])
+        except Exception:
+            statuses[index] = -1
+        latencies[index] = time.perf_counter() - t0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(timed, range(len(requests))))
+    elapsed = time.perf_counter() - started
+    errors = sum(1 for status in statuses if not 200 <= status < 400)
+    return {
+        'requests': len(requests),
+        'concurrency': concurrency,
+        'throughput_rps': len(requests) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'errors': errors,
+        # How far this scenario raised the process peak, and the peak itself.
+        'rss_growth_mb': peak_rss_mb() - peak_before,
+        'process_peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def environment():
+    from assets import MODEL_FILENAME, SCALER_FILENAME, LABEL_ENCODERS_FILENAME
+    paths = [os.path.join(ROOT, name) for name in (MODEL_FILENAME, SCALER_FILENAME, LABEL_ENCODERS_FILENAME)]
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'asset_hashes': asset_hashes(*paths) if all(os.path.exists(path) for path in paths) else None,
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline, throughput_tolerance, latency_tolerance):
+    """Returns a list of human-readable regressions of results against baseline."""
+    regressions = []
+    for key, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(key)
+        if previous is None:
+            continue
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - throughput_tolerance):
+            regressions.append(f"{key}: throughput {current['throughput_rps']:.1f} rps "
+                               f"< baseline {previous['throughput_rps']:.1f} rps")
+        for stat in ('p50_ms', 'p99_ms'):
+            if current[stat] > previous[stat] * (1 + latency_tolerance):
+                regressions.append(f"{key}: {stat} {current[stat]:.2f} > baseline {previous[stat]:.2f}")
+    return regressions
+
+
+def failed_requests(results):
+    """Scenarios with failed requests; their timings measure error pages, not the serving path."""
+    return [f"{key}: {stats['errors']} of {stats['requests']} requests failed"
+            for key, stats in results['scenarios'].items() if stats['errors']]
+
+
+def print_table(results, baseline):
+    print(f"{'scenario':<30}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'errors':>8}{'+RSS MB':>9}{'peak MB':>9}{'vs base':>9}")
+    for key, stats in results['scenarios'].items():
+        previous = (baseline or {}).get('scenarios', {}).get(key)
+        change = f"{stats['throughput_rps'] / previous['throughput_rps']:>8.2f}x" if previous else f"{'-':>9}"
+        print(f"{key:<30}{stats['throughput_rps']:>10.1f}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['errors']:>8}{stats['rss_growth_mb']:>9.1f}"
+              f"{stats['process_peak_rss_mb']:>9.1f}{change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the salary app's serving paths.")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--mode', choices=['inprocess', 'socket', 'both'], default='both')
+    parser.add_argument('--requests', type=int, default=400, help="Requests per scenario (fewer for bulk ones)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=100, help="Profiles per /predict_batch request")
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="Write the results as the new baseline")
+    parser.add_argument('--throughput-tolerance', type=float, default=0.15)
+    parser.add_argument('--latency-tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    from main import app, salary_assets
+    salary_assets.preload()
+    scenarios = renderable_scenarios(app, args.scenarios)
+    if not scenarios:
+        sys.exit("🚨 None of the requested scenarios can run in this tree.")
+
+    modes = ['inprocess', 'socket'] if args.mode == 'both' else [args.mode]
+    results = {'environment': environment(), 'settings': vars(args), 'scenarios': {}}
+    for mode in modes:
+        client = InProcessClient(app) if mode == 'inprocess' else SocketClient(app)
+        try:
+            for scenario in scenarios:
+                # Same seed per scenario so every run sends the same inputs.
+                mix = ProfileMix(os.path.join(ROOT, 'label_encoders.pkl'), seed=args.seed)
+                count = max(10, int(args.requests * REQUEST_SHARE.get(scenario, 1.0)))
+                requests = build_requests(scenario, mix, count + args.warmup, args.batch_size)
+                stats = run_scenario(client, requests[args.warmup:], args.concurrency,
+                                     warmup_requests=requests[:args.warmup])
+                results['scenarios'][f"{mode}/{scenario}"] = stats
+        finally:
+            if mode == 'socket':
+                client.close()
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+    print_table(results, baseline)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w') as handle:
+        json.dump(results, handle, indent=2)
+    print(f"✅ Results written to {args.out}")
+
+    failures = failed_requests(results)
+    if failures:
+        print("🚨 Requests failed during the run, so it cannot be compared or saved as a baseline:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as handle:
+            json.dump(results, handle, indent=2)
+        print(f"✅ Baseline written to {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"🚨 WARNING: No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return
+    if baseline['environment'].get('asset_hashes') != results['environment']['asset_hashes']:
+        print("🚨 WARNING: Model assets differ from the baseline's; comparing the retrained model against it.")
+    regressions = compare(results, baseline, args.throughput_tolerance, args.latency_tolerance)
+    if regressions:
+        print("🚨 Performance regressions against the baseline:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+    print("✅ No regressions against the baseline.")
+
+
+if __name__ == '__main__':
+    main()
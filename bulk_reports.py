@@ -0,0 +1,224 @@
+# bulk_reports.py
+#
+# Department-wide reports: predicts a whole CSV of profiles in one batch,
+# renders each PDF on a process pool and streams them into a ZIP archive as
+# they finish. Used by the /bulk_reports route and from the command line:
+#
+#   python bulk_reports.py profiles.csv -o reports.zip --workers 8
+
+import argparse
+import csv
+import math
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from assets import model_version
+from report import REPORT_FIELDS, ReportRenderer, contribution_text, interval_text, prediction_text
+
+# Report fields copied verbatim from the CSV (same names as /download_report's query parameters).
+PASSTHROUGH_FIELDS = [(key, param, default) for key, param, default in REPORT_FIELDS
+                      if key not in ('prediction', 'interval', 'contributions', 'age', 'gender', 'education', 'job_title', 'experience')]
+
+ERRORS_FILENAME = 'errors.txt'
+
+_renderer = None
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def render_report_pdf(report_data):
+    """Renders one report in a pool worker (one template per process, no cache).
+
+    Returns (pdf_bytes, None), or (None, message) for a report FPDF cannot
+    render (e.g. text outside latin-1), so one bad row does not end the archive.
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = ReportRenderer(cache_bytes=0)
+    try:
+        return _renderer.render_uncached(report_data), None
+    except ValueError as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def report_data_for_profile(record, predicted_usd, low_usd=math.nan, high_usd=math.nan,
+                            baseline_usd=math.nan, contributions_usd=()):
+    """Builds the download_report() fields for one CSV profile."""
+    report_data = {
+        "prediction": prediction_text(predicted_usd),
+        "interval": interval_text(low_usd, high_usd),
+        "contributions": contribution_text(baseline_usd, contributions_usd),
+        "age": record.get('Age', 'N/A'),
+        "gender": record.get('Gender', 'N/A'),
+        "education": record.get('Education Level', 'N/A'),
+        "job_title": record.get('Job Title', 'N/A'),
+        "experience": record.get('Years of Experience', 'N/A'),
+    }
+    for key, param, default in PASSTHROUGH_FIELDS:
+        report_data[key] = record.get(param) or default
+    return report_data
+
+
+def report_filename(index, report_data):
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', f"{report_data['user_name']} {report_data['job_title']}").strip('-')
+    return f"{index + 1:05d}-{slug[:60] or 'report'}.pdf"
+
+
+def build_reports(assets, records, audit_log=None):
+    """Predicts and explains every profile in one model call and returns their report fields."""
+    features = assets.build_feature_matrix(records)
+    explained = assets.explain_usd(features)
+    if audit_log is not None:
+        audit_log.record_many('bulk_reports', model_version(assets.hashes), records, features, explained[:, :3])
+    return [report_data_for_profile(record, *map(float, row[:3]), baseline_usd=assets.baseline_usd,
+                                    contributions_usd=[float(usd) for usd in row[3:]])
+            for record, row in zip(records, explained)]
+
+
+def pool_context():
+    # Never fork a (possibly threaded) web worker; forkserver/spawn children
+    # only import this module and report.py.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def shared_pool(workers=None):
+    """This process's render pool, started on first use and shared by every request.
+
+    Concurrent /bulk_reports requests queue on the same workers processes
+    (default: all cores) instead of each starting a pool of their own.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=pool_context())
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _discard_pool(executor):
+    # A pool whose worker died cannot take new tasks; the next request starts a fresh one.
+    global _pool
+    with _pool_lock:
+        if _pool is executor:
+            _pool = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _ChunkSink:
+    """Write-only file object collecting ZIP output until it is yielded."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_report_zip(reports, workers=None, failures=None, executor=None):
+    """Yields a ZIP archive of rendered reports chunk by chunk, in completion order.
+
+    Renders on executor when one is given (see shared_pool), otherwise on a
+    pool of workers processes that lasts as long as the archive. At most a few
+    tasks per worker are in flight, so memory stays bounded no matter how many
+    reports are requested. Reports that cannot be rendered are listed in
+    errors.txt at the end of the archive (and appended to failures as
+    (row number, message) when a list is given).
+    """
+    workers = workers or os.cpu_count() or 1
+    failures = [] if failures is None else failures
+    owned = executor is None
+    if owned:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=pool_context())
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        pending = {}
+        try:
+            queue = iter(enumerate(reports))
+            for index, report_data in queue:
+                pending[executor.submit(render_report_pdf, report_data)] = (index, report_data)
+                if len(pending) >= workers * 4:
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, report_data = pending.pop(future)
+                    pdf_content, error = future.result()
+                    if error is None:
+                        archive.writestr(report_filename(index, report_data), pdf_content)
+                    else:
+                        failures.append((index + 1, error))
+                    for index, report_data in queue:
+                        pending[executor.submit(render_report_pdf, report_data)] = (index, report_data)
+                        break
+                data = sink.drain()
+                if data:
+                    yield data
+        except BrokenProcessPool:
+            if not owned:
+                _discard_pool(executor)
+            raise
+        finally:
+            # Also runs when the client disconnects and the generator is closed.
+            if owned:
+                executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                for future in pending:
+                    future.cancel()
+        if failures:
+            lines = [f"Row {row}: {message}" for row, message in sorted(failures)]
+            archive.writestr(ERRORS_FILENAME, "\n".join(lines) + "\n")
+    yield sink.drain()
+
+
+def read_profiles(handle):
+    return list(csv.DictReader(handle))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render salary reports for every profile in a CSV into a ZIP.")
+    parser.add_argument('profiles', help="CSV with Age, Gender, Education Level, Job Title, Years of Experience")
+    parser.add_argument('-o', '--output', default='salary-reports.zip')
+    parser.add_argument('--workers', type=int, default=None, help="Render processes (default: all cores)")
+    args = parser.parse_args()
+
+    from assets import SalaryAssets
+    assets = SalaryAssets.load()
+    if not assets.ready:
+        sys.exit("🚨 Model assets are missing; cannot predict.")
+
+    started = time.perf_counter()
+    with open(args.profiles, newline='', encoding='utf-8-sig') as handle:
+        records = read_profiles(handle)
+    reports = build_reports(assets, records)
+    failures = []
+    with open(args.output, 'wb') as out:
+        for chunk in iter_report_zip(reports, workers=args.workers, failures=failures):
+            out.write(chunk)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Wrote {len(reports) - len(failures)} reports to {args.output} in {elapsed:.1f}s "
+          f"({len(reports) / max(elapsed, 1e-9):.1f} reports/s)")
+    if failures:
+        print(f"🚨 WARNING: {len(failures)} reports could not be rendered; see {ERRORS_FILENAME} in the archive.")
+
+
+if __name__ == '__main__':
+    main()
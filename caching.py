@@ -0,0 +1,153 @@
+# caching.py
+
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by total weight (entry count by default)."""
+
+    def __init__(self, maxsize=4096, weigh=None):
+        self.maxsize = maxsize
+        self._weigh = weigh or (lambda value: 1)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        weight = self._weigh(value)
+        if weight > self.maxsize:
+            return
+        with self._lock:
+            if key in self._data:
+                self.size -= self._weigh(self._data.pop(key))
+            self._data[key] = value
+            self.size += weight
+            while self.size > self.maxsize:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= self._weigh(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'size': self.size,
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class SharedStore:
+    """SQLite-backed key/value table shared by every worker on the host."""
+
+    TRIM_EVERY = 1024
+
+    def __init__(self, path, max_rows=1000000):
+        self.path = path
+        self.max_rows = max_rows
+        self._local = threading.local()
+        self._puts = 0
+        self._connect()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            # Connections must not cross a fork, so each worker opens its own.
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        try:
+            row = self._connect().execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, value):
+        try:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+            self._puts += 1
+            if self._puts % self.TRIM_EVERY == 0:
+                conn.execute("DELETE FROM cache WHERE rowid <= (SELECT MAX(rowid) FROM cache) - ?",
+                             (self.max_rows,))
+        except sqlite3.Error:
+            # A busy or read-only store only costs a cache miss.
+            pass
+
+
+class PredictionCache:
+    """Caches deterministic model outputs keyed on the encoded feature row.
+
+    Lookups go to the in-process LRU first and then, when configured, to a
+    SharedStore so gunicorn workers can reuse each other's results.
+    """
+
+    def __init__(self, maxsize=4096, shared_path=None, namespace=''):
+        self.local = LRUCache(maxsize)
+        self.shared = SharedStore(shared_path) if shared_path else None
+        # Prefix for shared keys, so workers on different model versions never
+        # read each other's values.
+        self.namespace = namespace
+        self.shared_hits = 0
+
+    @staticmethod
+    def key(features):
+        return tuple(float(value) for value in features)
+
+    def get_or_compute(self, features, compute):
+        """Returns the cached value for a feature row, calling compute(features) on a miss."""
+        key = self.key(features)
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        if self.shared is not None:
+            shared_key = self.namespace + ','.join(repr(part) for part in key)
+            value = self.shared.get(shared_key)
+            if value is not None:
+                self.shared_hits += 1
+                self.local.put(key, value)
+                return value
+        value = compute(features)
+        self.local.put(key, value)
+        if self.shared is not None:
+            self.shared.put(shared_key, value)
+        return value
+
+    def stats(self):
+        stats = self.local.stats()
+        stats['shared_hits'] = self.shared_hits
+        return stats
@@ -0,0 +1,292 @@
+# drift.py
+#
+# Input and prediction drift monitor for live /predict traffic.
+#
+# train.py saves a reference profile next to the model (drift_reference.json):
+# decile bins and counts for Age, Years of Experience and the predicted
+# salary, and category counts over each LabelEncoder vocabulary. The
+# DriftMonitor keeps the same fixed-size histograms for incoming requests,
+# plus the unknown-category rate, and scores them against the reference with
+# PSI (and a binned KS statistic for the numeric ones).
+#
+# An observation is a few bin lookups and increments, and memory is fixed by
+# the bin counts, so the monitor can stay on at full traffic. Counts cover
+# the current and the previous window (SALARY_DRIFT_WINDOW_SECONDS), so old
+# traffic ages out. Each worker process monitors its own requests, and
+# starts over (re-reading the reference) when the registry swaps the model.
+#
+#   python drift.py --build-reference --data "Salary Data.csv"   # for a model trained before train.py wrote one
+
+import argparse
+import bisect
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_REFERENCE_PATH = 'drift_reference.json'
+HISTOGRAM_BINS = 10
+
+# Conventional PSI reading: below 0.1 stable, up to 0.25 moderate shift, above that significant.
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+# Floor for empty bins so PSI stays finite.
+_EPSILON = 1e-4
+
+# A histogram is only scored once it has this many observations per bin;
+# below that, sampling noise alone reads as drift (Job Title has ~170 bins).
+MIN_ROWS_PER_BIN = 5
+
+
+def inner_edges(values, bins=HISTOGRAM_BINS):
+    """Interior quantile edges; with searchsorted they give bins + 1 open-ended buckets at most."""
+    values = np.asarray(values, dtype=np.float64)
+    edges = np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])
+    return np.unique(edges).tolist()
+
+
+def bucket_counts(edges, values):
+    buckets = np.searchsorted(np.asarray(edges, dtype=np.float64), np.asarray(values, dtype=np.float64), side='right')
+    return np.bincount(buckets, minlength=len(edges) + 1)
+
+
+def build_reference(features, predictions, vocabularies, feature_columns, version=None):
+    """Reference profile from the training rows (encoded features) and the model's predictions on them."""
+    features = np.asarray(features, dtype=np.float64)
+    reference = {'version': version, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 'rows': len(features), 'numeric': {}, 'categorical': {}}
+    for j, column in enumerate(feature_columns):
+        if column in vocabularies:
+            categories = [str(value) for value in vocabularies[column]]
+            counts = np.bincount(features[:, j].astype(np.intp), minlength=len(categories))
+            reference['categorical'][column] = {'categories': categories, 'counts': counts.tolist()}
+        else:
+            edges = inner_edges(features[:, j])
+            reference['numeric'][column] = {'edges': edges, 'counts': bucket_counts(edges, features[:, j]).tolist()}
+    edges = inner_edges(predictions)
+    reference['prediction'] = {'edges': edges, 'counts': bucket_counts(edges, predictions).tolist()}
+    return reference
+
+
+def save_reference(reference, path=DEFAULT_REFERENCE_PATH):
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, 'w') as handle:
+        json.dump(reference, handle, indent=1)
+    os.replace(partial, path)
+
+
+def load_reference(path=DEFAULT_REFERENCE_PATH):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def psi(expected, actual):
+    """Population stability index between two count vectors over the same bins."""
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    p = np.maximum(expected / max(expected.sum(), 1.0), _EPSILON)
+    q = np.maximum(actual / max(actual.sum(), 1.0), _EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def binned_ks(expected, actual):
+    """Largest gap between the two CDFs, evaluated at the bin edges."""
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    cdf_expected = np.cumsum(expected) / max(expected.sum(), 1.0)
+    cdf_actual = np.cumsum(actual) / max(actual.sum(), 1.0)
+    return float(np.max(np.abs(cdf_expected - cdf_actual)))
+
+
+def psi_status(value, rows, bins):
+    if rows < MIN_ROWS_PER_BIN * bins:
+        return 'insufficient_data'
+    if value >= PSI_SIGNIFICANT:
+        return 'significant'
+    if value >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+
+def score_histogram(expected, actual, rows, ks=True):
+    """PSI (and binned KS) of live counts against the reference; None below MIN_ROWS_PER_BIN."""
+    if rows < MIN_ROWS_PER_BIN * len(actual):
+        scores = {'psi': None, 'status': 'insufficient_data'}
+    else:
+        score = psi(expected, actual)
+        scores = {'psi': round(score, 4), 'status': psi_status(score, rows, len(actual))}
+    if ks:
+        scores['ks'] = None if scores['psi'] is None else round(binned_ks(expected, actual), 4)
+    return scores
+
+
+class DriftMonitor:
+    """Fixed-memory histograms of live inputs and predictions, scored against a reference."""
+
+    def __init__(self, reference, feature_columns, window_seconds=3600.0):
+        self.feature_columns = list(feature_columns)
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._reference_mtime = None
+        self._use(reference, None)
+
+    def _use(self, reference, model_version):
+        # Called with the lock held (or from __init__); starts empty windows.
+        self.reference = reference
+        self.model_version = model_version
+        self._numeric = [(self.feature_columns.index(column), spec['edges'])
+                         for column, spec in reference['numeric'].items()]
+        self._categorical = [(self.feature_columns.index(column), len(spec['categories']))
+                             for column, spec in reference['categorical'].items()]
+        self._prediction_edges = reference['prediction']['edges']
+        self._previous = self._empty_counts()
+        self._current = self._empty_counts()
+        self._window_started = time.time()
+
+    @property
+    def reference_stale(self):
+        """True when the reference was built for a different model version than the one being served."""
+        return self.model_version is not None and self.reference.get('version') != self.model_version
+
+    def track(self, model_version, path=DEFAULT_REFERENCE_PATH):
+        """Follows the serving model version.
+
+        A new version (a reload or a rollback) restarts the windows, so its
+        traffic is not scored with the old model's counts. A reference that
+        does not match the version is re-read from path whenever the file
+        changes; train.py writes it just after the model.
+        """
+        if model_version == self.model_version and not self.reference_stale:
+            return
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            reference = self.reference
+            if mtime is not None and mtime != self._reference_mtime:
+                try:
+                    reference = load_reference(path)
+                    self._reference_mtime = mtime
+                except (OSError, ValueError) as e:
+                    print(f"🚨 WARNING: Could not reload the drift reference from {path}: {e}")
+            if model_version != self.model_version or reference is not self.reference:
+                self._use(reference, model_version)
+
+    def _empty_counts(self):
+        return {
+            'rows': 0,
+            'unknown': {column: 0 for column in self.reference['categorical']},
+            'numeric': [np.zeros(len(edges) + 1, dtype=np.int64) for _, edges in self._numeric],
+            'categorical': [np.zeros(size, dtype=np.int64) for _, size in self._categorical],
+            'prediction': np.zeros(len(self._prediction_edges) + 1, dtype=np.int64),
+        }
+
+    def _window(self, now):
+        # Called with the lock held; after two idle windows both are empty.
+        elapsed = now - self._window_started
+        if elapsed >= self.window_seconds:
+            self._previous = self._current if elapsed < 2 * self.window_seconds else self._empty_counts()
+            self._current = self._empty_counts()
+            self._window_started = now
+        return self._current
+
+    # --- Observing ---
+
+    def observe(self, features, predicted_usd):
+        """Counts one encoded feature row and its prediction."""
+        with self._lock:
+            counts = self._window(time.time())
+            counts['rows'] += 1
+            for histogram, (j, edges) in zip(counts['numeric'], self._numeric):
+                histogram[bisect.bisect_right(edges, features[j])] += 1
+            for histogram, (j, size) in zip(counts['categorical'], self._categorical):
+                code = int(features[j])
+                if 0 <= code < size:
+                    histogram[code] += 1
+            if not math.isnan(predicted_usd):
+                counts['prediction'][bisect.bisect_right(self._prediction_edges, predicted_usd)] += 1
+
+    def observe_unknown(self, column):
+        """Counts a request rejected for an unknown category in column."""
+        with self._lock:
+            counts = self._window(time.time())
+            if column in counts['unknown']:
+                counts['unknown'][column] += 1
+
+    # --- Scoring ---
+
+    def report(self):
+        """PSI/KS per feature and for the prediction, over the current and previous windows."""
+        with self._lock:
+            self._window(time.time())
+            reference, version = self.reference, self.model_version
+            windows = (self._previous, self._current)
+            rows = sum(window['rows'] for window in windows)
+            unknown = {column: sum(window['unknown'][column] for window in windows)
+                       for column in reference['categorical']}
+            numeric = [sum(window['numeric'][k] for window in windows) for k in range(len(reference['numeric']))]
+            categorical = [sum(window['categorical'][k] for window in windows) for k in range(len(reference['categorical']))]
+            prediction = sum(window['prediction'] for window in windows)
+
+        features = {}
+        for (column, spec), live in zip(reference['numeric'].items(), numeric):
+            features[column] = score_histogram(spec['counts'], live, rows)
+        for (column, spec), live in zip(reference['categorical'].items(), categorical):
+            features[column] = score_histogram(spec['counts'], live, rows, ks=False)
+            features[column]['unknown_rate'] = round(unknown[column] / max(rows + unknown[column], 1), 4)
+        total_unknown = sum(unknown.values())
+        return {
+            'model_version': version,
+            'reference_version': reference.get('version'),
+            'reference_stale': version is not None and reference.get('version') != version,
+            'window_seconds': self.window_seconds,
+            'observations': rows,
+            'unknown_category_rate': round(total_unknown / max(rows + total_unknown, 1), 4),
+            'features': features,
+            'prediction': score_histogram(reference['prediction']['counts'], prediction, rows),
+        }
+
+    def gauges(self):
+        """Flat scores for the /metrics gauges.
+
+        A histogram without enough observations has no score and is left out,
+        so an alert on the PSI does not fire on a fresh or idle worker.
+        """
+        report = self.report()
+        values = {'observations': report['observations'], 'unknown_category_rate': report['unknown_category_rate'],
+                  'reference_stale': int(report['reference_stale'])}
+        if report['prediction']['psi'] is not None:
+            values['prediction_psi'] = report['prediction']['psi']
+        for column, scores in report['features'].items():
+            if scores['psi'] is not None:
+                values[f"{column.lower().replace(' ', '_')}_psi"] = scores['psi']
+        return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the drift reference profile for the current model.")
+    parser.add_argument('--build-reference', action='store_true')
+    parser.add_argument('--data', default='Salary Data.csv', help="Training CSV")
+    parser.add_argument('--out', default=DEFAULT_REFERENCE_PATH)
+    args = parser.parse_args()
+    if not args.build_reference:
+        parser.error("nothing to do; pass --build-reference")
+
+    import pandas as pd
+    from assets import FEATURE_COLUMNS, SalaryAssets, model_version
+    assets = SalaryAssets.load(cache_size=0)
+    df = pd.read_csv(args.data, encoding='utf-8-sig')[FEATURE_COLUMNS].dropna()
+    features = assets.build_feature_matrix(df.to_dict('records'))
+    reference = build_reference(features, assets.predict_usd(features), assets.feature_encoder.vocabularies,
+                                FEATURE_COLUMNS, version=model_version(assets.hashes))
+    save_reference(reference, args.out)
+    print(f"✅ Wrote the drift reference for model {reference['version']} ({reference['rows']} rows) to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
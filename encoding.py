@@ -0,0 +1,128 @@
+# encoding.py
+
+import difflib
+
+import numpy as np
+
+CATEGORICAL_COLUMNS = ('Gender', 'Education Level', 'Job Title')
+
+
+class UnknownCategoryError(ValueError):
+    """Raised when a categorical value is not in the fitted encoder vocabulary."""
+
+    def __init__(self, column, value, suggestions=(), row=None):
+        self.column = column
+        self.value = value
+        self.suggestions = list(suggestions)
+        self.row = row
+        if value is None:
+            message = f"Missing value for '{column}'."
+        else:
+            message = f"Unknown {column} '{value}'."
+        if self.suggestions:
+            message += " Did you mean: " + ", ".join(self.suggestions) + "?"
+        if row is not None:
+            message = f"Row {row}: {message}"
+        super().__init__(message)
+
+    def to_dict(self):
+        """Returns a JSON-friendly description of the error."""
+        return {
+            'error': 'unknown_category',
+            'message': str(self),
+            'column': self.column,
+            'value': self.value,
+            'suggestions': self.suggestions,
+            'row': self.row,
+        }
+
+
+def normalize_category(value):
+    """Case-folds a category and collapses runs of whitespace."""
+    return ' '.join(str(value).split()).casefold()
+
+
+class FeatureEncoder:
+    """Plain dict lookups from category string to the LabelEncoder code.
+
+    Tables are built once from the fitted encoders, so the request path does no
+    searchsorted or input validation. Unknown values raise UnknownCategoryError
+    unless the column has a fallback category configured.
+    """
+
+    def __init__(self, vocabularies, normalize=True, fallbacks=None):
+        self.normalize = normalize
+        self.vocabularies = {column: list(classes) for column, classes in vocabularies.items()}
+        self._exact = {}
+        self._normalized = {}
+        for column, classes in self.vocabularies.items():
+            self._exact[column] = {value: code for code, value in enumerate(classes)}
+            table = {}
+            ambiguous = set()
+            for code, value in enumerate(classes):
+                key = normalize_category(value)
+                if key in table:
+                    ambiguous.add(key)
+                table[key] = code
+            # Categories that only differ by case/spacing must be matched exactly.
+            for key in ambiguous:
+                del table[key]
+            self._normalized[column] = table
+
+        self.fallbacks = {}
+        for column, category in (fallbacks or {}).items():
+            if category not in self._exact.get(column, {}):
+                raise ValueError(f"Fallback '{category}' is not a known {column}.")
+            self.fallbacks[column] = self._exact[column][category]
+
+    @classmethod
+    def from_label_encoders(cls, label_encoders, **kwargs):
+        """Builds the lookup tables from the dict stored in label_encoders.pkl."""
+        vocabularies = {column: [str(value) for value in encoder.classes_]
+                        for column, encoder in label_encoders.items()}
+        return cls(vocabularies, **kwargs)
+
+    def __contains__(self, column):
+        return column in self._exact
+
+    def classes(self, column):
+        """Returns the categories of a column in code order."""
+        return self.vocabularies[column]
+
+    def encode(self, column, value):
+        """Returns the integer code for a single value."""
+        code = self._exact[column].get(value)
+        if code is None:
+            code = self._resolve(column, value)
+        return code
+
+    def encode_many(self, column, values):
+        """Encodes a sequence of values into an int64 array."""
+        codes = list(map(self._exact[column].get, values))
+        if None in codes:
+            for row, code in enumerate(codes):
+                if code is None:
+                    codes[row] = self._resolve(column, values[row], row=row)
+        return np.asarray(codes, dtype=np.int64)
+
+    def _resolve(self, column, value, row=None):
+        if value is not None:
+            key = normalize_category(value)
+            if self.normalize:
+                code = self._normalized[column].get(key)
+                if code is not None:
+                    return code
+            if column in self.fallbacks:
+                return self.fallbacks[column]
+            suggestions = self.suggest(column, key)
+        else:
+            if column in self.fallbacks:
+                return self.fallbacks[column]
+            suggestions = ()
+        raise UnknownCategoryError(column, value, suggestions, row=row)
+
+    def suggest(self, column, key, limit=3):
+        """Returns the closest known categories for a normalized value."""
+        by_key = {normalize_category(value): value for value in self.vocabularies[column]}
+        matches = difflib.get_close_matches(key, list(by_key), n=limit, cutoff=0.6)
+        return [by_key[match] for match in matches]
@@ -0,0 +1,279 @@
+# inference.py
+
+import warnings
+
+import numpy as np
+
+# Rows evaluated per traversal pass; bounds the (n_trees, chunk) node matrix.
+CHUNK_ROWS = 8192
+
+_SIGN_BIT = np.uint64(1 << 63)
+
+
+def _to_ordered(values):
+    """Maps float64 values to uint64 keys that sort in the same order."""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    negative = (bits & _SIGN_BIT) != 0
+    return np.where(negative, ~bits, bits | _SIGN_BIT)
+
+
+def _from_ordered(keys):
+    """Inverse of _to_ordered."""
+    keys = np.asarray(keys, dtype=np.uint64)
+    positive = (keys & _SIGN_BIT) != 0
+    bits = np.where(positive, keys & ~_SIGN_BIT, ~keys)
+    return bits.view(np.float64)
+
+
+def unwrap_forest(model):
+    """Returns the forest inside a (model-only) Pipeline, or the model itself."""
+    if hasattr(model, 'steps'):
+        for name, step in model.steps[:-1]:
+            if step not in (None, 'passthrough'):
+                raise ValueError(f"Pipeline step '{name}' cannot be folded into the forest.")
+        model = model.steps[-1][1]
+    from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+    if not isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        raise ValueError(f"Unsupported model type: {type(model).__name__}")
+    if model.n_outputs_ != 1:
+        raise ValueError("Only single-output forests are supported.")
+    return model
+
+
+def fold_thresholds(scaler, features, thresholds):
+    """Converts split thresholds on scaled features into thresholds on raw features.
+
+    The trees test float32(scaler(x)) <= t. For a monotone scaler that predicate
+    is monotone in x, so for every split we binary-search the float64 bit
+    patterns for the largest raw x that still goes left. Comparing raw inputs
+    against that value gives exactly the same decisions as the original model.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    if scaler is None or len(thresholds) == 0:
+        return thresholds.copy()
+    if np.any(np.asarray(scaler.scale_) <= 0):
+        raise ValueError("Scaler must be strictly increasing on every feature.")
+
+    rows = np.arange(len(thresholds))
+    probe = np.zeros((len(thresholds), scaler.n_features_in_), dtype=np.float64)
+
+    def goes_left(candidates):
+        probe[rows, features] = candidates
+        with warnings.catch_warnings(), np.errstate(over='ignore', invalid='ignore'):
+            warnings.simplefilter('ignore')
+            scaled = scaler.transform(probe)[rows, features]
+            # Probes near ±float64 max overflow float32 to ±inf, which still compares correctly.
+            return scaled.astype(np.float32) <= thresholds
+
+    big = np.finfo(np.float64).max
+    lo = np.full(len(thresholds), _to_ordered(np.array([-big]))[0])
+    hi = np.full(len(thresholds), _to_ordered(np.array([big]))[0])
+    always_left = goes_left(_from_ordered(hi))
+    never_left = ~goes_left(_from_ordered(lo))
+
+    # Invariant: goes_left(lo) is True and goes_left(hi) is False.
+    while True:
+        open_ = (hi - lo) > 1
+        open_ &= ~(always_left | never_left)
+        if not open_.any():
+            break
+        mid = lo + (hi - lo) // np.uint64(2)
+        left = goes_left(_from_ordered(mid))
+        lo = np.where(open_ & left, mid, lo)
+        hi = np.where(open_ & ~left, mid, hi)
+
+    folded = _from_ordered(lo)
+    folded[always_left] = np.inf
+    folded[never_left] = -np.inf
+    return folded
+
+
+def summarize_trees(per_tree, quantiles):
+    """Reduces an (n_trees, n_rows) matrix to (n_rows, 1 + len(quantiles)) columns.
+
+    Column 0 is the forest prediction (mean, accumulated tree by tree like
+    sklearn); the others are the requested quantiles across trees.
+    """
+    n_trees = per_tree.shape[0]
+    out = np.empty((per_tree.shape[1], 1 + len(quantiles)), dtype=np.float64)
+    out[:, 0] = np.cumsum(per_tree, axis=0)[-1] / n_trees
+    if len(quantiles):
+        # Linear interpolation between order statistics, as np.quantile does,
+        # but with one sort instead of its per-call overhead on small batches.
+        ordered = np.sort(per_tree, axis=0)
+        positions = np.asarray(quantiles, dtype=np.float64) * (n_trees - 1)
+        below = np.floor(positions).astype(np.intp)
+        above = np.minimum(below + 1, n_trees - 1)
+        fraction = (positions - below)[:, None]
+        out[:, 1:] = (ordered[below] + (ordered[above] - ordered[below]) * fraction).T
+    return out
+
+
+def _breadth_first_order(children_left, children_right):
+    """Returns node ids of one tree in breadth-first order."""
+    order = [0]
+    for node in order:
+        if children_left[node] != -1:
+            order.append(children_left[node])
+            order.append(children_right[node])
+    return np.asarray(order, dtype=np.intp)
+
+
+class ForestEngine:
+    """Random forest flattened into contiguous arrays with the scaler folded in.
+
+    Takes raw (unscaled) feature rows and returns the same float64 values as
+    ``model.predict(scaler.transform(X))``. Tree outputs are accumulated in
+    estimator order, which is the order sklearn uses when predicting with a
+    single job.
+    """
+
+    def __init__(self, feature, threshold, left, value, roots, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self._leaf_mask = self.left == np.arange(len(self.left))
+        self._contributions = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        """Flattens a fitted forest (optionally inside a Pipeline) and folds in the scaler."""
+        forest = unwrap_forest(model)
+        features, thresholds, lefts, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            order = _breadth_first_order(tree.children_left, tree.children_right)
+            position = np.empty_like(order)
+            position[order] = np.arange(len(order))
+            children = tree.children_left[order]
+            is_leaf = children == -1
+            # Siblings are adjacent, so the right child is always left + 1. Leaves
+            # point at themselves with an infinite threshold and stay put.
+            features.append(np.where(is_leaf, 0, tree.feature[order]))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold[order]))
+            lefts.append(np.where(is_leaf, np.arange(len(order)), position[children]) + offset)
+            values.append(tree.value[order, 0, 0])
+            roots.append(offset)
+            offset += len(order)
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature = np.concatenate(features)
+        threshold = np.concatenate(thresholds)
+        is_split = np.isfinite(threshold)
+        threshold[is_split] = fold_thresholds(scaler, feature[is_split], threshold[is_split])
+        return cls(
+            feature=feature.astype(np.int32),
+            threshold=threshold,
+            left=np.concatenate(lefts).astype(np.int32),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            n_features=forest.n_features_in_,
+        )
+
+    @property
+    def is_leaf(self):
+        return self._leaf_mask
+
+    def _check_input(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected rows with {self.n_features} features, got shape {X.shape}.")
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity.")
+        return X
+
+    def apply(self, X):
+        """Returns the (n_trees, n_rows) matrix of global leaf indices for raw rows."""
+        X = self._check_input(X)
+        n_rows = X.shape[0]
+        flat = X.ravel()
+        nodes = np.repeat(self.roots, n_rows)
+        offsets = np.tile(np.arange(n_rows) * self.n_features, self.n_trees)
+        # Only (tree, row) pairs that have not reached a leaf are advanced, so the
+        # work per level shrinks with the average path length, not the max depth.
+        active = np.arange(nodes.size)
+        current = nodes
+        for _ in range(self.max_depth):
+            following = self.left[current] + (flat[offsets + self.feature[current]] > self.threshold[current])
+            nodes[active] = following
+            keep = ~self._leaf_mask[following]
+            if not keep.any():
+                break
+            active = active[keep]
+            current = following[keep]
+            offsets = offsets[keep]
+        return nodes.reshape(self.n_trees, n_rows)
+
+    def predict_trees(self, X):
+        """Returns the (n_trees, n_rows) matrix of per-tree predictions."""
+        return self.value[self.apply(X)]
+
+    def predict(self, X):
+        """Predicts raw feature rows; equal to model.predict(scaler.transform(X))."""
+        return self.predict_quantiles(X, ())[:, 0]
+
+    @property
+    def bias(self):
+        """Mean root value: the prediction before any split, shared by every row."""
+        return float(np.mean(self.value[self.roots]))
+
+    def contribution_table(self):
+        """(n_features, n_nodes) feature contributions accumulated from each tree's root.
+
+        Walking a path, every split moves the prediction from the parent's value
+        to the child's; that change is credited to the split feature (Saabas).
+        Summed down to a leaf, the credits plus the root value give the leaf
+        value, so a row's contributions are one lookup per tree. Built once,
+        level by level, on first use.
+        """
+        table = getattr(self, '_contributions', None)
+        if table is None:
+            table = np.zeros((self.n_features, len(self.left)), dtype=np.float64)
+            frontier = np.asarray(self.roots, dtype=np.intp)
+            while len(frontier):
+                parents = frontier[~self._leaf_mask[frontier]]
+                lefts = self.left[parents].astype(np.intp)
+                for children in (lefts, lefts + 1):
+                    table[:, children] = table[:, parents]
+                    table[self.feature[parents], children] += self.value[children] - self.value[parents]
+                frontier = np.concatenate([lefts, lefts + 1])
+            self._contributions = table
+        return table
+
+    def explain(self, X, quantiles=()):
+        """Returns [prediction, *quantiles, *feature contributions] per raw row, from one traversal.
+
+        The contributions add up to prediction - bias.
+        """
+        X = self._check_input(X)
+        table = self.contribution_table()
+        out = np.empty((X.shape[0], 1 + len(quantiles) + self.n_features), dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            leaves = self.apply(X[start:start + CHUNK_ROWS])
+            rows = slice(start, start + leaves.shape[1])
+            out[rows, :1 + len(quantiles)] = summarize_trees(self.value[leaves], quantiles)
+            for j in range(self.n_features):
+                out[rows, 1 + len(quantiles) + j] = table[j][leaves].mean(axis=0)
+        return out
+
+    def predict_quantiles(self, X, quantiles):
+        """Returns [prediction, *per-tree quantiles] for each raw row, from one traversal."""
+        X = self._check_input(X)
+        out = np.empty((X.shape[0], 1 + len(quantiles)), dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            # cumsum is strictly sequential, matching sklearn's tree-by-tree accumulation.
+            out[start:start + CHUNK_ROWS] = summarize_trees(self.predict_trees(X[start:start + CHUNK_ROWS]), quantiles)
+        return out
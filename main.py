@@ -1,33 +1,136 @@
 
 # app.py
 
-from flask import Flask, render_template, request, make_response
-import joblib
+from flask import Flask, render_template, request, make_response, jsonify, Response, stream_with_context, got_request_exception
+import argparse
+import atexit
+import hmac
 import numpy as np
+import csv
+import io
+import math
 import os
-import random
-from fpdf import FPDF
-from flask import make_response, request
+from encoding import UnknownCategoryError
+from report import (ReportRenderer, contribution_items, contribution_text, interval_text, prediction_text,
+                    report_data_from_args)
+from bulk_reports import build_reports, iter_report_zip, shared_pool
+from metrics import metrics, StackSampler, PROFILE_HEADER
+from assets import (SalaryAssets, MODEL_FILENAME, SCALER_FILENAME,
+                    LABEL_ENCODERS_FILENAME, USD_TO_INR, FEATURE_COLUMNS, model_version)
+from registry import ModelRegistry
+from audit import AuditLog
+from drift import DriftMonitor, load_reference
 
 app = Flask(__name__)
 
-# --- Filenames ---
-MODEL_FILENAME = 'salary_model.pkl'
-SCALER_FILENAME = 'scaler1.pkl'
-LABEL_ENCODERS_FILENAME = 'label_encoders.pkl'
-
 # --- Load ML Assets ---
-def load_asset(filename):
-    if os.path.exists(filename):
-        print(f"✅ Loading {filename}...")
-        return joblib.load(filename)
-    else:
-        print(f"🚨 WARNING: File not found - {filename}.")
-        return None
-
-model = load_asset(MODEL_FILENAME)
-scaler = load_asset(SCALER_FILENAME)
-label_encoders = load_asset(LABEL_ENCODERS_FILENAME)
+# Lazy by default so each worker starts fast; see assets.py for preload/mmap modes.
+def load_salary_assets():
+    return SalaryAssets.load(
+        MODEL_FILENAME, SCALER_FILENAME, LABEL_ENCODERS_FILENAME,
+        artifact_filename=ARTIFACT_FILENAME,
+        mmap_dir=os.environ.get('SALARY_MMAP_DIR') or None,
+        grid_filename=os.environ.get('SALARY_GRID_PATH', 'prediction_grid.npy'),
+        cache_size=int(os.environ.get('SALARY_CACHE_SIZE', 4096)),
+        cache_path=os.environ.get('SALARY_CACHE_PATH') or None,
+        # Concurrent /predict misses are grouped into one model call of up to
+        # SALARY_BATCH_MAX_ROWS rows, waiting at most SALARY_BATCH_MAX_WAIT_MS.
+        batch_size=int(os.environ.get('SALARY_BATCH_MAX_ROWS', 64)),
+        batch_wait_ms=float(os.environ.get('SALARY_BATCH_MAX_WAIT_MS', 2)),
+    )
+
+ARTIFACT_FILENAME = os.environ.get('SALARY_ARTIFACT_PATH', 'salary_model.npz')
+
+# Replacing the model files reloads every worker without a restart (polled
+# every SALARY_RELOAD_POLL_SECONDS; 0 disables); see registry.py.
+salary_assets = ModelRegistry(
+    load_salary_assets,
+    watch_paths=(MODEL_FILENAME, SCALER_FILENAME, LABEL_ENCODERS_FILENAME, ARTIFACT_FILENAME),
+    checks_path=os.environ.get('SALARY_CHECKS_PATH', 'model_checks.json'),
+    poll_interval=float(os.environ.get('SALARY_RELOAD_POLL_SECONDS', 10)),
+    max_drift=float(os.environ.get('SALARY_RELOAD_MAX_DRIFT', 0.5)),
+)
+if os.environ.get('SALARY_PRELOAD') == '1':
+    salary_assets.preload()
+
+# --- Audit Log ---
+# Every prediction is recorded when SALARY_AUDIT_DIR is set; writes happen on a
+# background thread (see audit.py). SALARY_AUDIT_POLICY=block makes requests
+# wait instead of dropping entries when the buffer is full.
+AUDIT_DIR = os.environ.get('SALARY_AUDIT_DIR') or None
+audit_log = AuditLog(
+    AUDIT_DIR,
+    capacity=int(os.environ.get('SALARY_AUDIT_BUFFER', 50000)),
+    policy=os.environ.get('SALARY_AUDIT_POLICY', 'drop'),
+) if AUDIT_DIR else None
+if audit_log is not None:
+    atexit.register(audit_log.close)
+
+# --- Drift Monitor ---
+# /predict inputs and predictions are compared with the reference profile
+# train.py saves next to the model; scores are served on /drift. The monitor
+# follows the serving model version (see DriftMonitor.track).
+DRIFT_REFERENCE_PATH = os.environ.get('SALARY_DRIFT_REFERENCE', 'drift_reference.json')
+drift_monitor = DriftMonitor(
+    load_reference(DRIFT_REFERENCE_PATH), FEATURE_COLUMNS,
+    window_seconds=float(os.environ.get('SALARY_DRIFT_WINDOW_SECONDS', 3600)),
+) if os.path.exists(DRIFT_REFERENCE_PATH) else None
+
+# --- PDF Reports ---
+report_renderer = ReportRenderer(cache_bytes=int(os.environ.get('SALARY_REPORT_CACHE_BYTES', 64 * 1024 * 1024)))
+
+MAX_BATCH_ROWS = 100000
+
+def read_batch_records(req):
+    """Returns the profiles sent as a JSON array (or {"profiles": [...]}) or an uploaded CSV file."""
+    if 'file' in req.files:
+        text = req.files['file'].read().decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(text)))
+    payload = req.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('profiles')
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON array of profiles or a CSV upload in the 'file' field.")
+    return payload
+
+def render_form(template, **context):
+    """render_template() timed as the /predict render stage."""
+    with metrics.stage('predict', 'render'):
+        return render_template(template, **context)
+
+# --- Metrics ---
+# Gauges are read at scrape time; the model ones only once a request has loaded the assets.
+metrics.register_gauges('prediction_cache', lambda: salary_assets.get().cache.stats() if salary_assets.loaded else None)
+metrics.register_gauges('batcher', lambda: salary_assets.get().batcher.stats() if salary_assets.loaded else None)
+metrics.register_gauges('report_cache', report_renderer.cache.stats)
+if audit_log is not None:
+    metrics.register_gauges('audit', audit_log.stats)
+if drift_monitor is not None:
+    metrics.register_gauges('drift', drift_monitor.gauges)
+
+PROFILE_DIR = os.environ.get('SALARY_PROFILE_DIR') or None
+
+@app.before_request
+def start_profiler():
+    # Each profile starts a sampler thread and writes a file, so only admins
+    # (X-Admin-Token, see admin_allowed) may ask for one.
+    if PROFILE_DIR and request.headers.get(PROFILE_HEADER) == '1' and admin_allowed(request):
+        request.environ['salary.profiler'] = StackSampler().start()
+
+@app.after_request
+def finish_request(response):
+    route = request.endpoint or 'unmatched'
+    metrics.count_request(route, response.status_code)
+    profiler = request.environ.pop('salary.profiler', None)
+    if profiler is not None:
+        path = profiler.stop().save(PROFILE_DIR, route)
+        response.headers['X-Salary-Profile-Path'] = path
+    return response
+
+def count_unhandled_error(sender, exception, **extra):
+    metrics.count_error(request.endpoint or 'unmatched', exception)
+
+got_request_exception.connect(count_unhandled_error, app)
 
 # --- ROUTES ---
 
@@ -53,481 +156,210 @@ def predict_form():
 def predict():
     """Handles the form submission, predicts salary, and returns the result."""
     form_data = request.form
+    assets = salary_assets.get()
 
-    if not all([model, scaler, label_encoders]):
-        error_msg = "Prediction server not configured. Please check server logs for missing files."
+    if not assets.ready:
+        error_msg = "Prediction server not configured. Please check server logs for missing files or a rejected model version."
         return render_template('predict_form.html', error_text=error_msg, form_data=form_data)
 
     try:
-        input_data = {
-            'Age': float(form_data.get('Age')),
-            'Gender': form_data.get('Gender'),
-            'Education Level': form_data.get('Education Level'),
-            'Job Title': form_data.get('Job Title'),
-            'Years of Experience': float(form_data.get('Years of Experience'))
-        }
-        gender_encoded = label_encoders['Gender'].transform([input_data['Gender']])[0]
-        education_encoded = label_encoders['Education Level'].transform([input_data['Education Level']])[0]
-        job_title_encoded = label_encoders['Job Title'].transform([input_data['Job Title']])[0]
-        
-        input_features = np.array([[
+        with metrics.stage('predict', 'parse'):
+            input_data = {
+                'Age': float(form_data.get('Age')),
+                'Gender': form_data.get('Gender'),
+                'Education Level': form_data.get('Education Level'),
+                'Job Title': form_data.get('Job Title'),
+                'Years of Experience': float(form_data.get('Years of Experience'))
+            }
+            # float() accepts 'nan' and 'inf'; such a row would fail its whole micro-batch.
+            for column in ('Age', 'Years of Experience'):
+                if not math.isfinite(input_data[column]):
+                    raise ValueError(f"{column} must be a finite number")
+        with metrics.stage('predict', 'encode'):
+            feature_encoder = assets.feature_encoder
+            gender_encoded = feature_encoder.encode('Gender', input_data['Gender'])
+            education_encoded = feature_encoder.encode('Education Level', input_data['Education Level'])
+            job_title_encoded = feature_encoder.encode('Job Title', input_data['Job Title'])
+
+        input_features = [
             input_data['Age'], gender_encoded, education_encoded, 
             job_title_encoded, input_data['Years of Experience']
-        ]])
-        
-        scaled_features = scaler.transform(input_features)
-        predicted_salary_usd = model.predict(scaled_features)[0]
-        predicted_salary_inr = predicted_salary_usd * 83.3
-        final_prediction = max(0, predicted_salary_inr + random.uniform(-2500, 2500))
-        lakhs_pa = final_prediction / 100000
-        result_text = f"₹ {lakhs_pa:.2f} Lakhs p.a."
+        ]
         
-        return render_template('predict_form.html', 
-                               prediction_text=result_text, 
-                               form_data=form_data)
-    except Exception as e:
-        return render_template('predict_form.html', error_text=f"An error occurred: {e}", form_data=form_data)
+        # Scaling is folded into the forest engine, so this stage covers
+        # grid/cache lookup, batching and the model itself.
+        with metrics.stage('predict', 'model'):
+            predicted_salary_usd, low_usd, high_usd, *contributions_usd = assets.explain_one_usd(input_features)
+    except UnknownCategoryError as e:
+        metrics.count_error('predict', e)
+        if drift_monitor is not None:
+            drift_monitor.track(model_version(assets.hashes), DRIFT_REFERENCE_PATH)
+            drift_monitor.observe_unknown(e.column)
+        return render_form('predict_form.html', error_text=str(e), error_field=e.column,
+                           suggestions=e.suggestions, form_data=form_data)
+    except (ValueError, TypeError) as e:
+        # Missing or non-numeric Age / Years of Experience.
+        metrics.count_error('predict', e)
+        return render_form('predict_form.html', error_text=f"Invalid input: {e}", form_data=form_data)
+
+    if drift_monitor is not None:
+        drift_monitor.track(model_version(assets.hashes), DRIFT_REFERENCE_PATH)
+        drift_monitor.observe(input_features, predicted_salary_usd)
+    if audit_log is not None:
+        audit_log.record('predict', model_version(assets.hashes), input_data, input_features,
+                         (predicted_salary_usd, low_usd, high_usd))
+
+    # The range is the spread of the forest's trees, not display noise.
+    return render_form('predict_form.html', 
+                       prediction_text=prediction_text(predicted_salary_usd),
+                       interval_text=interval_text(low_usd, high_usd),
+                       # (feature, lakhs p.a.) pairs for display; the text is for the report link.
+                       contributions=contribution_items(contributions_usd),
+                       contribution_text=contribution_text(assets.baseline_usd, contributions_usd),
+                       form_data=form_data)
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """Predicts salaries for many profiles with a single scaler/model call."""
+    assets = salary_assets.get()
+    if not assets.ready:
+        return jsonify(error="Prediction server not configured. Please check server logs for missing files or a rejected model version."), 503
 
-from flask import make_response, request
-from fpdf import FPDF
-
-from flask import make_response, request
-from fpdf import FPDF
-
-@app.route('/download_report')
-def download_report():
     try:
-        # Collect all details from the request
-        report_data = {
-            "prediction": request.args.get('prediction', 'N/A'),
-            "age": request.args.get('age', 'N/A'),
-            "gender": request.args.get('gender', 'N/A'),
-            "education": request.args.get('education', 'N/A'),
-            "job_title": request.args.get('job_title', 'N/A'),
-            "experience": request.args.get('experience', 'N/A'),
-            "country": request.args.get('country', 'N/A'),
-            "industry": request.args.get('industry', 'N/A'),
-            "company_size": request.args.get('company_size', 'N/A'),
-            "employment_type": request.args.get('employment_type', 'N/A'),
-            "remote": request.args.get('remote', 'N/A'),
-            "skills": request.args.get('skills', 'N/A'),
-            "certifications": request.args.get('certifications', 'N/A'),
-            "relocate": request.args.get('relocate', 'N/A'),
-            "user_name": request.args.get('userName', 'Anonymous'),
-            "user_location": request.args.get('userLocation', 'Unknown'),
+        records = read_batch_records(request)
+        if len(records) > MAX_BATCH_ROWS:
+            return jsonify(error=f"Batch too large: {len(records)} rows (max {MAX_BATCH_ROWS})."), 413
+        if not records:
+            return jsonify(count=0, predictions=[])
+
+        input_features = assets.build_feature_matrix(records)
+        # ?explain=1 adds per-feature contributions from the same model pass.
+        explain = request.args.get('explain') == '1'
+        predicted = assets.explain_usd(input_features) if explain else assets.predict_interval_usd(input_features)
+    except UnknownCategoryError as e:
+        metrics.count_error('predict_batch', e)
+        return jsonify(e.to_dict()), 400
+    except (ValueError, TypeError, AttributeError) as e:
+        metrics.count_error('predict_batch', e)
+        return jsonify(error=f"Invalid batch: {e}"), 400
+
+    if audit_log is not None:
+        audit_log.record_many('predict_batch', model_version(assets.hashes), records, input_features, predicted[:, :3])
+
+    # Columns: prediction, the low and high ends of its interval, then any contributions.
+    predicted_inr = np.maximum(predicted[:, :3] * USD_TO_INR, 0)
+    predictions = [
+        {
+            'predicted_salary_usd': round(float(usd[0]), 2),
+            'predicted_salary_inr': round(float(inr[0]), 2),
+            'lakhs_pa': round(float(inr[0]) / 100000, 2),
+            # null when the model is not a forest and has no interval.
+            'interval_usd': None if np.isnan(usd[1:3]).any() else [round(float(value), 2) for value in usd[1:3]],
+            'interval_lakhs_pa': None if np.isnan(inr[1:]).any() else [round(float(value) / 100000, 2) for value in inr[1:]],
         }
+        for usd, inr in zip(predicted, predicted_inr)
+    ]
+    if explain and not np.isnan(predicted[:, 3:]).any():
+        for prediction, usd in zip(predictions, predicted[:, 3:]):
+            prediction['contributions_usd'] = {column: round(float(value), 2) for column, value in zip(FEATURE_COLUMNS, usd)}
+        return jsonify(count=len(predictions), baseline_usd=round(assets.baseline_usd, 2), predictions=predictions)
+    return jsonify(count=len(predictions), predictions=predictions)
 
-        class FancyPDF(FPDF):
-            def header(self):
-                # Main Banner
-                self.set_fill_color(76, 201, 240)
-                self.rect(0, 0, 210, 28, 'F')
-                self.set_text_color(255, 255, 255)
-                self.set_font("Helvetica", "B", 24)
-                self.set_xy(0, 10)
-                self.cell(0, 10, "Salary Prediction Report", align='C', ln=1)
-                # SmartPredict AI Stamp
-                self.set_font("Helvetica", "I", 11)
-                self.set_text_color(255, 255, 255)
-                self.set_xy(0, 20)
-                self.cell(0, 10, "Data provided by SmartPredict AI", align='C')
-                self.set_y(29)
-
-        pdf = FancyPDF()
-        pdf.add_page()
-
-        # Prepared for
-        pdf.set_font("Helvetica", "", 13)
-        pdf.set_text_color(95, 95, 100)
-        pdf.set_y(33)
-        pdf.cell(0, 9, f"Prepared for: {report_data['user_name']} ({report_data['user_location']})", ln=1, align='C')
-        pdf.ln(4)
-
-        # Salary Prediction Card
-        y = pdf.get_y()
-        pdf.set_x(20)
-        pdf.set_draw_color(250, 190, 78)
-        pdf.set_fill_color(250, 232, 158)
-        pdf.rect(20, y, 170, 32, 'DF')
-        pdf.set_xy(20, y + 6)
-        pdf.set_text_color(43, 45, 66)
-        pdf.set_font("Helvetica", "B", 15)
-        pdf.cell(170, 8, "Your Predicted Annual Salary", ln=1, align='C')
-        pdf.set_font("Helvetica", "B", 26)
-        pdf.set_text_color(76, 201, 240)
-        pdf.cell(170, 12, report_data['prediction'].replace('₹', 'Rs.'), ln=1, align='C')
-        pdf.ln(12)
-
-        # Profile Section
-        y = pdf.get_y()
-        pdf.set_x(14)
-        pdf.set_fill_color(236, 245, 252)
-        pdf.rect(14, y, 182, 88, 'F')
-        pdf.set_y(y + 4)
-        pdf.set_x(18)
-        pdf.set_text_color(54, 79, 107)
-        pdf.set_font("Helvetica", "B", 14)
-        pdf.cell(70, 8, "Candidate Profile", ln=1)
-        pdf.set_font("Helvetica", "", 12)
-        pdf.set_text_color(60, 68, 80)
-        profile_rows = [
-            ("Name", report_data['user_name']),
-            ("Location", report_data['user_location']),
-            ("Age", report_data['age']),
-            ("Gender", report_data['gender']),
-            ("Education", report_data['education']),
-            ("Job Title", report_data['job_title']),
-            ("Experience", f"{report_data['experience']} years"),
-            ("Country", report_data['country']),
-            ("Industry", report_data['industry']),
-            ("Company Size", report_data['company_size']),
-            ("Employment Type", report_data['employment_type']),
-            ("Work Setup", report_data['remote']),
-            ("Willing to Relocate", report_data['relocate']),
-        ]
-        for field, value in profile_rows:
-            pdf.set_x(18)
-            pdf.cell(60, 8, f"{field}:", border=0)
-            pdf.cell(0, 8, f"{value}", ln=1, border=0)
-        pdf.ln(2)
-
-        # Skills Section Card
-        y = pdf.get_y()
-        pdf.set_x(14)
-        pdf.set_fill_color(225, 250, 255)
-        pdf.rect(14, y, 182, 16, 'F')
-        pdf.set_y(y + 3)
-        pdf.set_x(18)
-        pdf.set_font("Helvetica", "B", 13)
-        pdf.set_text_color(24, 117, 163)
-        pdf.cell(0, 7, "Key Skills", ln=1)
-        pdf.set_x(18)
-        pdf.set_font("Helvetica", "", 12)
-        pdf.set_text_color(33, 40, 49)
-        pdf.multi_cell(174, 7, report_data['skills'])
-        pdf.ln(2)
-
-        # Certifications Section Card
-        y = pdf.get_y()
-        pdf.set_x(14)
-        pdf.set_fill_color(250, 232, 158)
-        pdf.rect(14, y, 182, 16, 'F')
-        pdf.set_y(y + 3)
-        pdf.set_x(18)
-        pdf.set_font("Helvetica", "B", 13)
-        pdf.set_text_color(140, 100, 35)
-        pdf.cell(0, 7, "Certifications", ln=1)
-        pdf.set_x(18)
-        pdf.set_font("Helvetica", "", 12)
-        pdf.set_text_color(90, 55, 15)
-        pdf.multi_cell(174, 7, report_data['certifications'])
-        pdf.ln(2)
-
-        # Explanation & Confidentiality Footer
-        pdf.set_x(14)
-        pdf.set_font("Helvetica", "I", 11)
-        pdf.set_text_color(104, 123, 164)
-        pdf.multi_cell(0, 7, 
-    "- Data provided by you via the SmartPredict AI interface.\n"
-    "- AI uses machine learning models, salary datasets, and pay equity best practices to forecast likely salaries for similar profiles in your region and industry.\n\n"
-    "All information is confidential and generated exclusively for you by SmartPredict AI.",
-    align='L'
-)
-
-
-        # Faint "stamp"/credit at the bottom right corner
-        pdf.set_xy(-80, 277)
-        pdf.set_font("Helvetica", "B", 10)
-        pdf.set_text_color(230, 230, 230)
-        pdf.cell(70, 9, "Generated by SmartPredict AI", ln=1, align='R')
-
-        pdf_content = pdf.output(dest='S').encode('latin-1')
-        response = make_response(pdf_content)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = 'attachment; filename=salary-prediction-report.pdf'
-        return response
-    except Exception as e:
-        return f"<h1>Error Generating PDF</h1><p>An error occurred: {e}</p>"
-
+@app.route('/download_report')
+def download_report():
     try:
         # Collect all details from the request
-        report_data = {
-            "prediction": request.args.get('prediction', 'N/A'),
-            "age": request.args.get('age', 'N/A'),
-            "gender": request.args.get('gender', 'N/A'),
-            "education": request.args.get('education', 'N/A'),
-            "job_title": request.args.get('job_title', 'N/A'),
-            "experience": request.args.get('experience', 'N/A'),
-            "country": request.args.get('country', 'N/A'),
-            "industry": request.args.get('industry', 'N/A'),
-            "company_size": request.args.get('company_size', 'N/A'),
-            "employment_type": request.args.get('employment_type', 'N/A'),
-            "remote": request.args.get('remote', 'N/A'),
-            "skills": request.args.get('skills', 'N/A'),
-            "certifications": request.args.get('certifications', 'N/A'),
-            "relocate": request.args.get('relocate', 'N/A'),
-            "user_name": request.args.get('userName', 'Anonymous'),
-            "user_location": request.args.get('userLocation', 'Unknown'),
-        }
-
-        class FancyPDF(FPDF):
-            def header(self):
-                # Main Banner
-                self.set_fill_color(76, 201, 240)
-                self.rect(0, 0, 210, 28, 'F')
-                self.set_text_color(255, 255, 255)
-                self.set_font("Helvetica", "B", 24)
-                self.set_xy(0, 10)
-                self.cell(0, 10, "Salary Prediction Report", align='C', ln=1)
-                # SmartPredict AI Stamp
-                self.set_font("Helvetica", "I", 11)
-                self.set_text_color(255, 255, 255)
-                self.set_xy(0, 20)
-                self.cell(0, 10, "Data provided by SmartPredict AI", align='C')
-                self.set_y(29)
-
-        pdf = FancyPDF()
-        pdf.add_page()
-
-        # Prepared for
-        pdf.set_font("Helvetica", "", 13)
-        pdf.set_text_color(95, 95, 100)
-        pdf.set_y(33)
-        pdf.cell(0, 9, f"Prepared for: {report_data['user_name']} ({report_data['user_location']})", ln=1, align='C')
-        pdf.ln(4)
-
-        # Salary Prediction Card
-        pdf.set_x(20)
-        pdf.set_draw_color(250, 190, 78)
-        pdf.set_fill_color(250, 232, 158)
-        pdf.rect(20, y, 170, 36, style='DF')
-        pdf.set_xy(20, pdf.get_y() + 6)
-        pdf.set_text_color(43, 45, 66)
-        pdf.set_font("Helvetica", "B", 15)
-        pdf.cell(170, 8, "Your Predicted Annual Salary", ln=1, align='C')
-        pdf.set_font("Helvetica", "B", 26)
-        pdf.set_text_color(76, 201, 240)
-        pdf.cell(170, 12, report_data['prediction'].replace('₹', 'Rs.'), ln=1, align='C')
-        pdf.ln(12)
-
-        # Profile Section
-        y0 = pdf.get_y()
-        pdf.set_x(14)
-        pdf.set_fill_color(236, 245, 252)
-        ppdf.rect(20, y, 170, 36, style='DF')
-        pdf.set_y(y0 + 4)
-        pdf.set_x(18)
-        pdf.set_text_color(54, 79, 107)
-        pdf.set_font("Helvetica", "B", 14)
-        pdf.cell(70, 8, "Candidate Profile", ln=1)
-        pdf.set_font("Helvetica", "", 12)
-        pdf.set_text_color(60, 68, 80)
-        profile_rows = [
-            ("Name", report_data['user_name']),
-            ("Location", report_data['user_location']),
-            ("Age", report_data['age']),
-            ("Gender", report_data['gender']),
-            ("Education", report_data['education']),
-            ("Job Title", report_data['job_title']),
-            ("Experience", f"{report_data['experience']} years"),
-            ("Country", report_data['country']),
-            ("Industry", report_data['industry']),
-            ("Company Size", report_data['company_size']),
-            ("Employment Type", report_data['employment_type']),
-            ("Work Setup", report_data['remote']),
-            ("Key Skills", report_data['skills']),
-            ("Certifications", report_data['certifications']),
-            ("Willing to Relocate", report_data['relocate']),
-        ]
-        for field, value in profile_rows:
-            pdf.set_x(18)
-            pdf.cell(60, 8, f"{field}:", border=0)
-            pdf.cell(0, 8, f"{value}", ln=1, border=0)
-        pdf.ln(4)
-
-        # Explanation & Footer
-        pdf.set_x(14)
-        pdf.set_font("Helvetica", "I", 11)
-        pdf.set_text_color(104, 123, 164)
-        pdf.multi_cell(0, 7, 
-            "• Data provided by you via the SmartPredict AI interface.\n"
-            "• AI uses machine learning models, salary datasets, and pay equity best practices to forecast likely salaries for similar profiles in your region and industry.\n\n"
-            "All information is confidential and generated exclusively for you by SmartPredict AI.",
-            align='L'
-        )
-
-        # Faint "stamp" at bottom right as watermark
-        pdf.set_xy(-80, 277)
-        pdf.set_font("Helvetica", "B", 10)
-        pdf.set_text_color(230, 230, 230)
-        pdf.cell(70, 9, "Generated by SmartPredict AI", ln=1, align='R')
-
-        pdf_content = pdf.output(dest='S').encode('latin-1')
+        report_data = report_data_from_args(request.args)
+        pdf_content = report_renderer.render(report_data)
         response = make_response(pdf_content)
         response.headers['Content-Type'] = 'application/pdf'
         response.headers['Content-Disposition'] = 'attachment; filename=salary-prediction-report.pdf'
         return response
-    except Exception as e:
+    except ValueError as e:
+        # Text FPDF cannot encode (it only supports latin-1 core fonts).
+        metrics.count_error('download_report', e)
         return f"<h1>Error Generating PDF</h1><p>An error occurred: {e}</p>"
 
-    try:
-        report_data = {
-            "prediction": request.args.get('prediction', 'N/A'),
-            "age": request.args.get('age', 'N/A'),
-            "gender": request.args.get('gender', 'N/A'),
-            "education": request.args.get('education', 'N/A'),
-            "job_title": request.args.get('job_title', 'N/A'),
-            "experience": request.args.get('experience', 'N/A'),
-            "country": request.args.get('country', 'N/A'),
-            "industry": request.args.get('industry', 'N/A'),
-            "company_size": request.args.get('company_size', 'N/A'),
-            "employment_type": request.args.get('employment_type', 'N/A'),
-            "remote": request.args.get('remote', 'N/A'),
-            "skills": request.args.get('skills', 'N/A'),
-            "certifications": request.args.get('certifications', 'N/A'),
-            "relocate": request.args.get('relocate', 'N/A'),
-            "user_name": request.args.get('userName', 'Anonymous'),
-            "user_location": request.args.get('userLocation', 'Unknown'),
-        }
+@app.route('/bulk_reports', methods=['POST'])
+def bulk_reports():
+    """Streams a ZIP of PDF reports for every profile in an uploaded CSV (or JSON array)."""
+    assets = salary_assets.get()
+    if not assets.ready:
+        return jsonify(error="Prediction server not configured. Please check server logs for missing files or a rejected model version."), 503
 
-        # Custom FPDF theme for attractive design
-        pdf = FPDF()
-        pdf.add_page()
-
-        # Cover banner (can use a colored rectangle as a header background)
-        pdf.set_fill_color(76, 201, 240)     # vibrant cyan
-        pdf.rect(0, 0, 210, 30, 'F')
-        pdf.set_text_color(255,255,255)
-        pdf.set_font("Helvetica", "B", 24)
-        pdf.set_y(10)
-        pdf.cell(0, 10, "Salary Prediction Report", ln=True, align='C')
-        pdf.set_text_color(68,68,68)
-        pdf.set_font("Helvetica", "", 13)
-        pdf.set_y(25)
-        pdf.cell(0, 8, f"Prepared for: {report_data['user_name']} ({report_data['user_location']})", ln=True, align='C')
-        pdf.set_y(40)
-
-        # Section: Salary Highlight
-        pdf.set_draw_color(76,201,240)
-        pdf.set_fill_color(250, 232, 158)
-        pdf.set_text_color(43,45,66)
-        pdf.set_font("Helvetica", "B", 15)
-        pdf.cell(0, 12, "Predicted Annual Salary", ln=True, align='C', fill=1, border=1)
-        pdf.set_font("Helvetica", "B", 29)
-        pdf.set_text_color(76, 201, 240)
-        prediction_text = report_data['prediction'].replace('₹', 'Rs.')
-        pdf.cell(0, 20, prediction_text, ln=True, align='C')
-        pdf.ln(5)
-        pdf.set_text_color(43, 45, 66)
-
-        # Section divider
-        pdf.set_draw_color(76,201,240)
-        pdf.set_line_width(1)
-        y = pdf.get_y()
-        pdf.line(15, y, 195, y)
-        pdf.ln(4)
-
-        # Section: Employee Profile
-        pdf.set_font("Helvetica", "B", 15)
-        pdf.cell(0, 10, "Employee Profile", ln=True)
-        pdf.set_font("Helvetica", "", 12)
-        pdf.set_fill_color(242, 244, 255)
-        
-        def info_row(label, value):
-            pdf.set_font("Helvetica", "B", 12)
-            pdf.set_text_color(44, 62, 80)
-            pdf.cell(46, 9, f"{label}:", border=0, align='R', fill=1)
-            pdf.set_font("Helvetica", "", 12)
-            pdf.set_text_color(70, 70, 86)
-            pdf.cell(120, 9, f"{value}", border=0, align='L', fill=0)
-            pdf.ln(8)
-
-        info_row("Job Title", report_data['job_title'])
-        info_row("Country", report_data['country'])
-        info_row("Industry", report_data['industry'])
-        info_row("Company Size", report_data['company_size'])
-        info_row("Employment Type", report_data['employment_type'])
-        info_row("Remote/On-site", report_data['remote'])
-        info_row("Education", report_data['education'])
-        info_row("Experience (years)", report_data['experience'])
-        info_row("Age", report_data['age'])
-        info_row("Gender", report_data['gender'])
-        info_row("Willing to Relocate", report_data['relocate'])
-
-        # Section: Skills and Certifications as shaded boxes
-        pdf.ln(4)
-        pdf.set_font("Helvetica", "B", 13)
-        pdf.set_fill_color(204,235,255)
-        pdf.set_text_color(54,79,107)
-        pdf.cell(0, 9, "Key Skills", ln=True, fill=1)
-        pdf.set_font("Helvetica", "", 12)
-        pdf.set_text_color(33,40,49)
-        pdf.multi_cell(0, 8, report_data['skills'], fill=0)
-        pdf.ln(2)
-        pdf.set_font("Helvetica", "B", 13)
-        pdf.set_fill_color(250,232,158)
-        pdf.set_text_color(54,79,107)
-        pdf.cell(0, 9, "Certifications", ln=True, fill=1)
-        pdf.set_font("Helvetica", "", 12)
-        pdf.set_text_color(33,40,49)
-        pdf.multi_cell(0, 8, report_data['certifications'], fill=0)
-
-        pdf_content = pdf.output(dest='S').encode('latin-1')
-        response = make_response(pdf_content)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = 'attachment; filename=salary-prediction-report.pdf'
-        return response
-    except Exception as e:
-        return f"<h1>Error Generating PDF</h1><p>An error occurred: {e}</p>"
     try:
-        report_data = {
-            "prediction": request.args.get('prediction', 'N/A'),
-            "age": request.args.get('age', 'N/A'),
-            "gender": request.args.get('gender', 'N/A'),
-            "education": request.args.get('education', 'N/A'),
-            "job_title": request.args.get('job_title', 'N/A'),
-            "experience": request.args.get('experience', 'N/A'),
-            "user_name": request.args.get('userName', 'Anonymous'),
-            "user_location": request.args.get('userLocation', 'Unknown'),
-        }
-
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        
-        pdf.set_font("Helvetica", "B", 20)
-        pdf.cell(0, 10, "Salary Prediction Report", ln=True, align='C')
-        pdf.set_font("Helvetica", "", 12)
-        pdf.cell(0, 10, f"Prepared for: {report_data['user_name']} ({report_data['user_location']})", ln=True, align='C')
-        pdf.ln(10)
-
-        pdf.set_font("Helvetica", "", 14)
-        pdf.cell(0, 10, "Predicted Annual Salary:", ln=True, align='C')
-        pdf.set_font("Helvetica", "B", 28)
-        prediction_text = report_data['prediction'].replace('₹', 'Rs.')
-        pdf.cell(0, 12, prediction_text, ln=True, align='C')
-        pdf.ln(10)
-        
-        pdf.set_font("Helvetica", "B", 16)
-        pdf.cell(0, 10, "Employee Profile", ln=True)
-        pdf.line(pdf.get_x(), pdf.get_y(), pdf.get_x() + 190, pdf.get_y())
-        pdf.ln(5)
-
-        pdf.set_font("Helvetica", "", 12)
-        pdf.cell(95, 8, f"Age: {report_data['age']}")
-        pdf.cell(95, 8, f"Gender: {report_data['gender']}", ln=True)
-        pdf.cell(95, 8, f"Education: {report_data['education']}")
-        pdf.cell(95, 8, f"Experience: {report_data['experience']} years", ln=True)
-        pdf.multi_cell(0, 8, f"Job Title: {report_data['job_title']}")
-        
-        pdf_content = pdf.output(dest='S').encode('latin-1')
-        
-        response = make_response(pdf_content)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = 'attachment; filename=salary-prediction-report.pdf'
-        return response
-    except Exception as e:
-        return f"<h1>Error Generating PDF</h1><p>An error occurred: {e}</p>"
+        records = read_batch_records(request)
+        if len(records) > MAX_BATCH_ROWS:
+            return jsonify(error=f"Batch too large: {len(records)} rows (max {MAX_BATCH_ROWS})."), 413
+        reports = build_reports(assets, records, audit_log=audit_log)
+    except UnknownCategoryError as e:
+        metrics.count_error('bulk_reports', e)
+        return jsonify(e.to_dict()), 400
+    except (ValueError, TypeError, AttributeError) as e:
+        metrics.count_error('bulk_reports', e)
+        return jsonify(error=f"Invalid batch: {e}"), 400
+
+    # One render pool per server process, so SALARY_REPORT_WORKERS bounds the
+    # render processes however many bulk requests are streaming.
+    workers = int(os.environ.get('SALARY_REPORT_WORKERS', 0)) or os.cpu_count() or 1
+    archive = iter_report_zip(reports, workers=workers, executor=shared_pool(workers))
+    response = Response(stream_with_context(archive), mimetype='application/zip')
+    response.headers['Content-Disposition'] = 'attachment; filename=salary-prediction-reports.zip'
+    return response
+
+# --- Admin ---
+# Disabled unless SALARY_ADMIN_TOKEN is set; callers send it as X-Admin-Token.
+ADMIN_TOKEN = os.environ.get('SALARY_ADMIN_TOKEN') or None
+
+def admin_allowed(req):
+    token = req.headers.get('X-Admin-Token', '')
+    return ADMIN_TOKEN is not None and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+@app.route('/admin/model')
+def admin_model():
+    """Shows the live and previous model versions and the last reload result."""
+    if not admin_allowed(request):
+        return jsonify(error="Forbidden"), 403
+    return jsonify(salary_assets.status())
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Loads, validates and swaps in the model files currently on disk (in the background unless ?wait=1)."""
+    if not admin_allowed(request):
+        return jsonify(error="Forbidden"), 403
+    wait = request.args.get('wait') == '1'
+    if not salary_assets.reload(wait=wait):
+        return jsonify(error="A reload is already in progress.", **salary_assets.status()), 409
+    return jsonify(salary_assets.status()), 200 if wait else 202
+
+@app.route('/admin/rollback', methods=['POST'])
+def admin_rollback():
+    """Swaps the previous model version back in."""
+    if not admin_allowed(request):
+        return jsonify(error="Forbidden"), 403
+    if not salary_assets.rollback():
+        return jsonify(error="No previous model version to roll back to."), 409
+    return jsonify(salary_assets.status())
+
+@app.route('/drift')
+def drift():
+    """PSI/KS drift scores of this worker's recent /predict traffic against the training reference."""
+    if drift_monitor is None:
+        return jsonify(error=f"No drift reference at {DRIFT_REFERENCE_PATH}; run 'python drift.py --build-reference'."), 404
+    if salary_assets.loaded:
+        drift_monitor.track(model_version(salary_assets.get().hashes), DRIFT_REFERENCE_PATH)
+    return jsonify(drift_monitor.report())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint for this worker process."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="SmartPredict salary prediction server")
+    parser.add_argument('--preload', action='store_true',
+                        help="Load the model assets at startup instead of on the first request")
+    args = parser.parse_args()
+    if args.preload:
+        salary_assets.preload()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,182 @@
+# metrics.py
+#
+# In-process request metrics rendered in the Prometheus text format at
+# /metrics: per-stage latency histograms, request counts by status and error
+# counts by exception type. Each worker process keeps its own numbers;
+# Prometheus scrapes and sums them per instance.
+#
+# Opt-in profiling: with SALARY_PROFILE_DIR set, a request carrying the
+# header "X-Salary-Profile: 1" and a valid X-Admin-Token is sampled by a
+# StackSampler and its folded stacks (flamegraph.pl / speedscope input) are
+# written to that directory.
+
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Seconds; tuned for stages between a few microseconds and a few seconds.
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PROFILE_HEADER = 'X-Salary-Profile'
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as Prometheus expects."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            yield bound, running
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Process-wide registry of stage timers, request and error counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = defaultdict(Histogram)
+        self.requests = Counter()
+        self.errors = Counter()
+        self._gauges = {}
+
+    @contextmanager
+    def stage(self, route, name):
+        """Times a block into salary_stage_seconds{route, stage}."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(route, name, time.perf_counter() - started)
+
+    def observe(self, route, name, seconds):
+        with self._lock:
+            self.stages[(route, name)].observe(seconds)
+
+    def count_request(self, route, status):
+        with self._lock:
+            self.requests[(route, status)] += 1
+
+    def count_error(self, route, error):
+        with self._lock:
+            self.errors[(route, type(error).__name__)] += 1
+
+    def register_gauges(self, prefix, collect):
+        """Adds gauges read at scrape time; collect() returns {name: number} or None."""
+        self._gauges[prefix] = collect
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            stages = {key: (list(hist.cumulative()), hist.total, hist.count)
+                      for key, hist in self.stages.items()}
+            requests = dict(self.requests)
+            errors = dict(self.errors)
+
+        lines = ['# HELP salary_stage_seconds Time spent in each request stage.',
+                 '# TYPE salary_stage_seconds histogram']
+        for (route, name), (buckets, total, count) in sorted(stages.items()):
+            for bound, running in buckets:
+                labels = _labels(('route', 'stage', 'le'), (route, name, _number(bound)))
+                lines.append(f"salary_stage_seconds_bucket{labels} {running}")
+            labels = _labels(('route', 'stage'), (route, name))
+            lines.append(f"salary_stage_seconds_sum{labels} {total!r}")
+            lines.append(f"salary_stage_seconds_count{labels} {count}")
+
+        lines += ['# HELP salary_requests_total Requests by route and HTTP status.',
+                  '# TYPE salary_requests_total counter']
+        for (route, status), count in sorted(requests.items()):
+            lines.append(f"salary_requests_total{_labels(('route', 'status'), (route, status))} {count}")
+
+        lines += ['# HELP salary_errors_total Handled and unhandled errors by route and exception type.',
+                  '# TYPE salary_errors_total counter']
+        for (route, error), count in sorted(errors.items()):
+            lines.append(f"salary_errors_total{_labels(('route', 'type'), (route, error))} {count}")
+
+        for prefix, collect in sorted(self._gauges.items()):
+            values = collect() or {}
+            for name, value in sorted(values.items()):
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    lines.append(f"# TYPE salary_{prefix}_{name} gauge")
+                    lines.append(f"salary_{prefix}_{name} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and aggregates folded stacks.
+
+    Sampling keeps the cost to the profiled request small and bounded, unlike
+    cProfile's per-call hooks, and the other threads are not affected at all.
+    """
+
+    def __init__(self, thread_id=None, interval=0.001):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='salary-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def save(self, directory, name):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{name}.folded")
+        with open(path, 'w') as handle:
+            handle.write(self.folded())
+        return path
@@ -0,0 +1,123 @@
+# model_artifact.py
+#
+# Pickle-free model artifact: the flattened forest (scaler folded into its
+# thresholds) and the encoder vocabularies in one versioned .npz file. Loading
+# it needs only NumPy, so workers skip unpickling sklearn objects and do not
+# import sklearn or joblib at all.
+#
+#   python model_artifact.py                 # writes salary_model.npz
+#
+# Re-run it after retraining; the artifact records the hashes of the pickles
+# it was exported from.
+
+import argparse
+import json
+import os
+import time
+import warnings
+
+import numpy as np
+
+from inference import ForestEngine
+from prediction_grid import asset_hashes
+
+ARTIFACT_FORMAT_VERSION = 1
+DEFAULT_ARTIFACT_PATH = 'salary_model.npz'
+ENGINE_ARRAYS = ('feature', 'threshold', 'left', 'value', 'roots')
+
+
+def save_artifact(path, engine, vocabularies, feature_columns, hashes=None, extra=None):
+    """Writes the engine arrays and metadata to an uncompressed .npz."""
+    meta = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'feature_columns': list(feature_columns),
+        'vocabularies': vocabularies,
+        'max_depth': engine.max_depth,
+        'n_features': engine.n_features,
+        'n_trees': engine.n_trees,
+        'hashes': hashes,
+        'exported_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    meta.update(extra or {})
+    arrays = {name: getattr(engine, name) for name in ENGINE_ARRAYS}
+    with open(path, 'wb') as handle:
+        np.savez(handle, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def load_artifact(path):
+    """Returns (engine, meta) from an artifact written by save_artifact."""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        if meta.get('format_version') != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"unsupported artifact format {meta.get('format_version')}")
+        arrays = {name: data[name] for name in ENGINE_ARRAYS}
+    engine = ForestEngine(max_depth=meta['max_depth'], n_features=meta['n_features'], **arrays)
+    return engine, meta
+
+
+def export_model(out_path, model_path, scaler_path, encoders_path, check_rows=20000, seed=0):
+    """Exports the pickled assets and verifies the artifact reproduces the model exactly."""
+    import joblib
+    import sklearn
+
+    from assets import FEATURE_COLUMNS
+
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    label_encoders = joblib.load(encoders_path)
+    engine = ForestEngine.from_sklearn(model, scaler)
+    # Sequential accumulation, as in the engine, so the comparison can be exact.
+    forest = model.steps[-1][1] if hasattr(model, 'steps') else model
+    if hasattr(forest, 'n_jobs'):
+        forest.set_params(n_jobs=1)
+    vocabularies = {column: [str(value) for value in encoder.classes_]
+                    for column, encoder in label_encoders.items()}
+
+    # Random rows spanning the scaler's fitted range and a margin around it.
+    rng = np.random.default_rng(seed)
+    low, high = scaler.data_min_, scaler.data_max_
+    margin = (high - low) * 0.25
+    rows = rng.uniform(low - margin, high + margin, size=(check_rows, len(FEATURE_COLUMNS)))
+    for column, name in enumerate(FEATURE_COLUMNS):
+        if name in vocabularies:
+            rows[:, column] = rng.integers(0, len(vocabularies[name]), size=check_rows)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = model.predict(scaler.transform(rows))
+
+    # Written and verified next to the destination, then renamed into place:
+    # workers and the registry watcher only ever see a complete, checked file.
+    partial = f"{out_path}.{os.getpid()}.tmp"
+    try:
+        save_artifact(partial, engine, vocabularies, FEATURE_COLUMNS,
+                      hashes=asset_hashes(model_path, scaler_path, encoders_path),
+                      extra={'sklearn_version': sklearn.__version__})
+        exported, _ = load_artifact(partial)
+        mismatches = int(np.count_nonzero(exported.predict(rows) != expected))
+        if mismatches:
+            raise ValueError(f"exported model differs from {model_path} on {mismatches} of {check_rows} rows")
+        os.replace(partial, out_path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the salary model to a pickle-free .npz artifact.")
+    parser.add_argument('--out', default=DEFAULT_ARTIFACT_PATH)
+    parser.add_argument('--model', default='salary_model.pkl')
+    parser.add_argument('--scaler', default='scaler1.pkl')
+    parser.add_argument('--encoders', default='label_encoders.pkl')
+    parser.add_argument('--check-rows', type=int, default=20000,
+                        help="Random rows the artifact must reproduce bit for bit")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    engine = export_model(args.out, args.model, args.scaler, args.encoders, check_rows=args.check_rows)
+    print(f"✅ Wrote {args.out}: {engine.n_trees} trees, {len(engine.left):,} nodes, "
+          f"verified on {args.check_rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+# prediction_grid.py
+#
+# Offline build step: evaluates the model over every Gender x Education Level x
+# Job Title combination and a grid of integer ages and half-year experience
+# steps, and stores the result as memory-mapped .npy tables. Each cell holds
+# the full explained prediction (see SalaryAssets.explain_usd): the
+# prediction and its interval in float64, bit-identical to the live model,
+# and one contribution per feature in a float32 side table
+# (prediction_grid.contributions.npy) that is only read for explanations.
+#
+#   python prediction_grid.py --workers 8
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import warnings
+
+import numpy as np
+
+GRID_FORMAT_VERSION = 3
+DEFAULT_GRID_PATH = 'prediction_grid.npy'
+CATEGORY_AXES = ('Gender', 'Education Level', 'Job Title')
+
+
+def file_sha256(path):
+    """Returns the hex SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def asset_hashes(model_path, scaler_path, encoders_path):
+    return {
+        'model': file_sha256(model_path),
+        'scaler': file_sha256(scaler_path),
+        'label_encoders': file_sha256(encoders_path),
+    }
+
+
+def metadata_path(grid_path):
+    return os.path.splitext(grid_path)[0] + '.json'
+
+
+def contributions_path(grid_path):
+    return os.path.splitext(grid_path)[0] + '.contributions.npy'
+
+
+class PredictionGrid:
+    """Read-only, memory-mapped table of model outputs indexed by feature row.
+
+    Axis order is (Gender, Education Level, Job Title, Age, Years of Experience,
+    value). The values are meta['columns']: the prediction columns of table,
+    then the contribution columns of contributions. Rows whose age or
+    experience do not land exactly on a grid step are reported as misses so
+    the caller can fall back to the live model.
+    """
+
+    def __init__(self, table, contributions, meta):
+        self.table = table
+        self.contributions = contributions
+        self.meta = meta
+        self.age_start = float(meta['age']['start'])
+        self.age_step = float(meta['age']['step'])
+        self.exp_start = float(meta['experience']['start'])
+        self.exp_step = float(meta['experience']['step'])
+        self.shape = table.shape[:5]
+        self.columns = meta['columns']
+
+    @classmethod
+    def load(cls, grid_path, expected_hashes):
+        """Opens a grid, refusing it if it was built from different assets."""
+        with open(metadata_path(grid_path)) as handle:
+            meta = json.load(handle)
+        if meta.get('format_version') != GRID_FORMAT_VERSION:
+            raise ValueError(f"unsupported grid format {meta.get('format_version')}")
+        for name, digest in expected_hashes.items():
+            if meta['hashes'].get(name) != digest:
+                raise ValueError(f"grid is stale: {name} hash does not match")
+        table = np.load(grid_path, mmap_mode='r')
+        contributions = np.load(contributions_path(grid_path), mmap_mode='r')
+        if list(table.shape) != meta['shape'] or list(contributions.shape) != meta['contributions_shape']:
+            raise ValueError("grid shape does not match its metadata")
+        return cls(table, contributions, meta)
+
+    def _axis_index(self, values, start, step, size):
+        position = (np.asarray(values, dtype=np.float64) - start) / step
+        index = np.rint(position)
+        hit = (index == position) & (index >= 0) & (index < size)
+        return np.where(hit, index, 0).astype(np.intp), hit
+
+    def lookup_many(self, features, explain=False):
+        """Returns (values, hit_mask) for an (n, 5) encoded feature matrix.
+
+        values holds the prediction columns, followed by the contributions
+        (as float64) when explain is set.
+        """
+        features = np.asarray(features, dtype=np.float64)
+        n_gender, n_education, n_job, n_age, n_exp = self.shape
+        hit = np.ones(len(features), dtype=bool)
+        indices = []
+        for column, size in zip((1, 2, 3), (n_gender, n_education, n_job)):
+            index, ok = self._axis_index(features[:, column], 0.0, 1.0, size)
+            indices.append(index)
+            hit &= ok
+        age, ok = self._axis_index(features[:, 0], self.age_start, self.age_step, n_age)
+        hit &= ok
+        experience, ok = self._axis_index(features[:, 4], self.exp_start, self.exp_step, n_exp)
+        hit &= ok
+        cells = (indices[0], indices[1], indices[2], age, experience)
+        values = np.asarray(self.table[cells])
+        if explain:
+            values = np.concatenate([values, np.asarray(self.contributions[cells], dtype=np.float64)], axis=1)
+        return values, hit
+
+    def lookup(self, features, explain=False):
+        """Returns the grid values for one feature row as a tuple, or None when it is off-grid."""
+        values, hit = self.lookup_many(np.asarray(features, dtype=np.float64).reshape(1, -1), explain)
+        return tuple(float(value) for value in values[0]) if hit[0] else None
+
+
+# --- Build ---
+
+_worker = {}
+
+
+def _init_worker(model_path, scaler_path, ages, experience, quantiles):
+    import joblib
+
+    from inference import ForestEngine
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    # One job per process; the pool already uses every core, and sequential
+    # accumulation keeps the output bit-identical to the live engine.
+    forest = model.steps[-1][1] if hasattr(model, 'steps') else model
+    if hasattr(forest, 'n_jobs'):
+        forest.set_params(n_jobs=1)
+    try:
+        engine = ForestEngine.from_sklearn(model, scaler)
+    except ValueError:
+        # Not a forest: predictions only, no interval or contributions.
+        engine = None
+    _worker.update(model=model, scaler=scaler, engine=engine, ages=ages, experience=experience,
+                   quantiles=quantiles)
+
+
+def _evaluate_slab(codes):
+    gender, education, job = codes
+    ages, experience = _worker['ages'], _worker['experience']
+    age_grid, exp_grid = np.meshgrid(ages, experience, indexing='ij')
+    rows = np.column_stack([
+        age_grid.ravel(),
+        np.full(age_grid.size, gender, dtype=np.float64),
+        np.full(age_grid.size, education, dtype=np.float64),
+        np.full(age_grid.size, job, dtype=np.float64),
+        exp_grid.ravel(),
+    ])
+    if _worker['engine'] is not None:
+        values = _worker['engine'].explain(rows, _worker['quantiles'])
+    else:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            predicted = _worker['model'].predict(_worker['scaler'].transform(rows))
+        values = np.full((len(rows), 1 + len(_worker['quantiles']) + rows.shape[1]), np.nan)
+        values[:, 0] = predicted
+    return codes, values.reshape(len(ages), len(experience), -1)
+
+
+def grid_columns(quantiles, feature_columns):
+    """Names of the per-cell values, in SalaryAssets.explain_usd order."""
+    return (['prediction'] + [f"q{q:g}" for q in quantiles]
+            + [f"contribution:{column}" for column in feature_columns])
+
+
+def build_grid(out_path, model_path, scaler_path, encoders_path, quantiles, feature_columns,
+               age_min=18, age_max=70, exp_max=40.0, exp_step=0.5, workers=None):
+    """Evaluates the model over the full grid on every core and writes the table."""
+    import joblib
+    label_encoders = joblib.load(encoders_path)
+    vocabularies = {column: [str(value) for value in label_encoders[column].classes_]
+                    for column in CATEGORY_AXES}
+    ages = np.arange(age_min, age_max + 1, dtype=np.float64)
+    experience = np.arange(0.0, exp_max + exp_step / 2, exp_step)
+    columns = grid_columns(quantiles, feature_columns)
+    cells = tuple(len(vocabularies[column]) for column in CATEGORY_AXES) + (len(ages), len(experience))
+    n_predicted = 1 + len(quantiles)
+    shape = cells + (n_predicted,)
+    contributions_shape = cells + (len(feature_columns),)
+
+    # Built under temporary names and renamed into place: running workers keep
+    # the old table mapped (its inode survives the rename) and never see a
+    # half-written one. The tables go first and the sidecar last, as in
+    # load_mmap_engine.
+    partial = f"{out_path}.{os.getpid()}.tmp"
+    partial_contributions = f"{contributions_path(out_path)}.{os.getpid()}.tmp"
+    partial_meta = f"{metadata_path(out_path)}.{os.getpid()}.tmp"
+    try:
+        table = np.lib.format.open_memmap(partial, mode='w+', dtype=np.float64, shape=shape)
+        # Contributions are only displayed, so float32 is plenty and keeps the grid small.
+        contributions = np.lib.format.open_memmap(partial_contributions, mode='w+', dtype=np.float32,
+                                                  shape=contributions_shape)
+        slabs = list(np.ndindex(*shape[:3]))
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(model_path, scaler_path, ages, experience, tuple(quantiles))) as pool:
+            for (gender, education, job), values in pool.imap_unordered(_evaluate_slab, slabs, chunksize=8):
+                table[gender, education, job] = values[..., :n_predicted]
+                contributions[gender, education, job] = values[..., n_predicted:]
+        table.flush()
+        contributions.flush()
+        del table, contributions
+
+        meta = {
+            'format_version': GRID_FORMAT_VERSION,
+            'shape': list(shape),
+            'contributions_shape': list(contributions_shape),
+            'axes': ['Gender', 'Education Level', 'Job Title', 'Age', 'Years of Experience', 'value'],
+            'columns': columns,
+            'age': {'start': float(ages[0]), 'step': 1.0},
+            'experience': {'start': 0.0, 'step': float(exp_step)},
+            'categories': vocabularies,
+            'hashes': asset_hashes(model_path, scaler_path, encoders_path),
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        with open(partial_meta, 'w') as handle:
+            json.dump(meta, handle, indent=2)
+        os.replace(partial, out_path)
+        os.replace(partial_contributions, contributions_path(out_path))
+        os.replace(partial_meta, metadata_path(out_path))
+    finally:
+        for path in (partial, partial_contributions, partial_meta):
+            if os.path.exists(path):
+                os.remove(path)
+    return shape
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the salary prediction grid.")
+    parser.add_argument('--out', default=DEFAULT_GRID_PATH)
+    parser.add_argument('--model', default='salary_model.pkl')
+    parser.add_argument('--scaler', default='scaler1.pkl')
+    parser.add_argument('--encoders', default='label_encoders.pkl')
+    parser.add_argument('--age-min', type=int, default=18)
+    parser.add_argument('--age-max', type=int, default=70)
+    parser.add_argument('--exp-max', type=float, default=40.0)
+    parser.add_argument('--exp-step', type=float, default=0.5)
+    parser.add_argument('--workers', type=int, default=None, help="Processes to use (default: all cores)")
+    args = parser.parse_args()
+
+    from assets import FEATURE_COLUMNS, INTERVAL_QUANTILES
+    started = time.perf_counter()
+    shape = build_grid(args.out, args.model, args.scaler, args.encoders, INTERVAL_QUANTILES, FEATURE_COLUMNS,
+                       age_min=args.age_min, age_max=args.age_max,
+                       exp_max=args.exp_max, exp_step=args.exp_step, workers=args.workers)
+    cells = int(np.prod(shape[:5]))
+    print(f"✅ Wrote {args.out}: {cells:,} cells {shape} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
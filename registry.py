@@ -0,0 +1,274 @@
+# registry.py
+#
+# Hot model reload. ModelRegistry serves the current SalaryAssets and, when
+# the model files change on disk (or /admin/reload is called), loads the new
+# version on a background thread, checks it against the stored check inputs
+# in model_checks.json, warms it up and swaps it in with a single reference
+# assignment. Requests already running keep the version they started with.
+# The replaced version is kept for an instant /admin/rollback. A worker's
+# first load goes through the same checks; a version that fails them is
+# loaded but never served (assets.ready is False, /admin/model shows why).
+#
+# Every worker process runs its own registry and watcher, so replacing the
+# files reloads all workers; an admin call only reaches the worker that
+# served it.
+#
+#   python registry.py --record-checks      # refresh model_checks.json after an accepted retrain
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from assets import FEATURE_COLUMNS, LazyAssets, model_version
+
+DEFAULT_CHECKS_PATH = 'model_checks.json'
+
+
+class ValidationError(ValueError):
+    """Raised when a candidate model fails the reload checks."""
+
+
+def file_signature(paths):
+    """(size, mtime) of every path, None for missing ones; changes when a file is replaced."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def load_checks(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def validate_assets(assets, checks, max_drift=0.5):
+    """Checks a candidate against the stored profiles; returns its predictions.
+
+    The candidate must be ready, encode every check profile, return finite
+    non-negative salaries, and keep the median relative change against the
+    recorded predictions within max_drift.
+    """
+    if not assets.ready:
+        raise ValidationError("model assets are incomplete")
+    if not checks or not checks.get('profiles'):
+        return None
+    profiles = checks['profiles']
+    try:
+        predicted = np.asarray(assets.predict_usd(assets.build_feature_matrix(profiles)), dtype=np.float64)
+    except ValueError as e:
+        raise ValidationError(f"check profiles cannot be predicted: {e}") from e
+    if predicted.shape != (len(profiles),) or not np.isfinite(predicted).all():
+        raise ValidationError("model returned non-finite predictions")
+    if (predicted < 0).any():
+        raise ValidationError("model returned negative salaries")
+    expected = np.asarray(checks.get('expected_usd') or [], dtype=np.float64)
+    if len(expected) == len(predicted):
+        drift = float(np.median(np.abs(predicted - expected) / np.maximum(np.abs(expected), 1.0)))
+        if drift > max_drift:
+            raise ValidationError(f"median change {drift:.1%} against the recorded predictions exceeds {max_drift:.0%}")
+    return predicted
+
+
+class ModelRegistry(LazyAssets):
+    """LazyAssets that can swap in a new model version, and back, while serving."""
+
+    def __init__(self, loader, watch_paths=(), checks_path=DEFAULT_CHECKS_PATH,
+                 poll_interval=0.0, max_drift=0.5):
+        super().__init__(loader)
+        self.watch_paths = tuple(watch_paths)
+        self.checks_path = checks_path
+        self.poll_interval = poll_interval
+        self.max_drift = max_drift
+        self._previous = None
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+        self._watcher = None
+        self._watcher_pid = None
+        self._signature = None
+        self.last_reload = None
+        self.loaded_at = None
+
+    # --- Serving ---
+
+    def get(self):
+        assets = super().get()
+        if self.poll_interval > 0 and self._watcher_pid != os.getpid():
+            self._start_watcher()
+        return assets
+
+    def _load(self):
+        # Taken before loading so a file replaced mid-load still triggers a reload.
+        signature = file_signature(self.watch_paths)
+        started = time.perf_counter()
+        assets = super()._load()
+        self.loaded_at = time.time()
+        self._signature = signature
+        # A fresh worker gets the same checks as a reload, so a version the
+        # running workers rejected does not go live wherever a worker starts.
+        try:
+            self._check(assets)
+        except Exception as e:
+            assets.rejected = f"{type(e).__name__}: {e}"
+            self.last_reload = {'status': 'rejected', 'version': model_version(assets.hashes),
+                                'error': assets.rejected, 'at': time.time(),
+                                'seconds': round(time.perf_counter() - started, 3)}
+            print(f"🚨 WARNING: Model {model_version(assets.hashes)} failed its checks and is not served "
+                  f"(pid {os.getpid()}): {e}")
+        return assets
+
+    def _check(self, candidate):
+        """Validates a loaded version against the check profiles and warms it up."""
+        checks = load_checks(self.checks_path) if self.checks_path and os.path.exists(self.checks_path) else None
+        # Validation runs the check profiles through the grid/engine and
+        # doubles as the warm-up.
+        validate_assets(candidate, checks, self.max_drift)
+        if checks and checks.get('profiles'):
+            candidate.explain_one_usd(candidate.build_feature_matrix(checks['profiles'][:1])[0])
+
+    def status(self):
+        current, previous = self._assets, self._previous
+        return {
+            'version': model_version(current.hashes) if current is not None else None,
+            'serving': current is not None and current.ready,
+            'loaded_at': self.loaded_at,
+            'previous_version': model_version(previous.hashes) if previous is not None else None,
+            'reloading': self._reloading,
+            'last_reload': self.last_reload,
+            'watching': self.poll_interval > 0,
+        }
+
+    # --- Reload / rollback ---
+
+    def reload(self, wait=False):
+        """Starts loading a new version in the background; returns False if one is already loading."""
+        with self._reload_lock:
+            if self._reloading:
+                return False
+            self._reloading = True
+        thread = threading.Thread(target=self._reload, name='salary-reload', daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def _reload(self):
+        started = time.perf_counter()
+        signature = file_signature(self.watch_paths)
+        try:
+            candidate = self._loader()
+            self._check(candidate)
+        except Exception as e:
+            self.last_reload = {'status': 'rejected', 'error': f"{type(e).__name__}: {e}",
+                                'at': time.time(), 'seconds': round(time.perf_counter() - started, 3)}
+            print(f"🚨 WARNING: Model reload rejected: {e}")
+        else:
+            self._swap(candidate)
+            self.last_reload = {'status': 'ok', 'version': model_version(candidate.hashes),
+                                'at': time.time(), 'seconds': round(time.perf_counter() - started, 3)}
+            print(f"✅ Model {model_version(candidate.hashes)} live (pid {os.getpid()}, "
+                  f"{time.perf_counter() - started:.2f}s)")
+        finally:
+            # A rejected version is not retried until the files change again.
+            self._signature = signature
+            self._reloading = False
+
+    def _swap(self, candidate):
+        with self._lock:
+            retired, self._previous = self._previous, self._assets
+            self._assets = candidate
+            self.loaded_at = time.time()
+        if retired is not None:
+            retired.batcher.close()
+
+    def rollback(self):
+        """Swaps the previous version back in; returns False when there is none that can serve."""
+        with self._lock:
+            if self._previous is None or not self._previous.ready:
+                return False
+            self._assets, self._previous = self._previous, self._assets
+            self.loaded_at = time.time()
+        self.last_reload = {'status': 'rolled back', 'version': model_version(self._assets.hashes), 'at': time.time()}
+        print(f"✅ Rolled back to model {model_version(self._assets.hashes)} (pid {os.getpid()})")
+        return True
+
+    # --- File watcher ---
+
+    def _start_watcher(self):
+        with self._reload_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            self._watcher = threading.Thread(target=self._watch, name='salary-model-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        pending = None
+        while True:
+            time.sleep(self.poll_interval)
+            signature = file_signature(self.watch_paths)
+            if signature == self._signature:
+                pending = None
+                continue
+            # Files are usually replaced one after another; reload once they
+            # have stopped changing for a full poll interval.
+            if signature != pending:
+                pending = signature
+                continue
+            pending = None
+            self.reload()
+
+
+def record_checks(assets, profiles, path=DEFAULT_CHECKS_PATH):
+    """Stores check profiles with the given assets' predictions as the reference."""
+    predicted = assets.predict_usd(assets.build_feature_matrix(profiles))
+    checks = {
+        'version': model_version(assets.hashes),
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'profiles': profiles,
+        'expected_usd': [round(float(value), 4) for value in predicted],
+    }
+    with open(path, 'w') as handle:
+        json.dump(checks, handle, indent=1)
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the model reload check inputs.")
+    parser.add_argument('--record-checks', action='store_true',
+                        help="Record check profiles and the current model's predictions")
+    parser.add_argument('--data', default='Salary Data.csv', help="CSV to draw check profiles from")
+    parser.add_argument('--rows', type=int, default=50)
+    parser.add_argument('--out', default=DEFAULT_CHECKS_PATH)
+    args = parser.parse_args()
+    if not args.record_checks:
+        parser.error("nothing to do; pass --record-checks")
+
+    import csv
+    from assets import SalaryAssets
+    assets = SalaryAssets.load()
+    with open(args.data, newline='', encoding='utf-8-sig') as handle:
+        rows = list(csv.DictReader(handle))
+    profiles = []
+    for row in rows:
+        profile = {column: row.get(column) for column in FEATURE_COLUMNS}
+        if not all(profile.values()):
+            continue
+        profile['Age'] = float(profile['Age'])
+        profile['Years of Experience'] = float(profile['Years of Experience'])
+        profiles.append(profile)
+    step = max(1, len(profiles) // args.rows)
+    checks = record_checks(assets, profiles[::step][:args.rows], args.out)
+    print(f"✅ Wrote {len(checks['profiles'])} check profiles for model {checks['version']} to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
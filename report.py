@@ -0,0 +1,332 @@
+# report.py
+#
+# Salary prediction PDF report. The static layout (banner, card frames, field
+# labels, watermark) is drawn once into a template document; each request
+# clones it and only fills in the variable fields. Finished PDFs are cached by
+# a hash of their normalized inputs.
+
+import copy
+import hashlib
+import json
+import math
+import threading
+
+from fpdf import FPDF
+
+from assets import FEATURE_COLUMNS, INTERVAL_QUANTILES, USD_TO_INR
+from caching import LRUCache
+from metrics import metrics
+
+# (report key, query parameter, default)
+REPORT_FIELDS = [
+    ("prediction", "prediction", "N/A"),
+    ("interval", "interval", ""),
+    ("contributions", "contributions", ""),
+    ("age", "age", "N/A"),
+    ("gender", "gender", "N/A"),
+    ("education", "education", "N/A"),
+    ("job_title", "job_title", "N/A"),
+    ("experience", "experience", "N/A"),
+    ("country", "country", "N/A"),
+    ("industry", "industry", "N/A"),
+    ("company_size", "company_size", "N/A"),
+    ("employment_type", "employment_type", "N/A"),
+    ("remote", "remote", "N/A"),
+    ("skills", "skills", "N/A"),
+    ("certifications", "certifications", "N/A"),
+    ("relocate", "relocate", "N/A"),
+    ("user_name", "userName", "Anonymous"),
+    ("user_location", "userLocation", "Unknown"),
+]
+
+MULTILINE_FIELDS = ("skills", "certifications", "contributions")
+
+PROFILE_LABELS = [
+    "Name", "Location", "Age", "Gender", "Education", "Job Title", "Experience",
+    "Country", "Industry", "Company Size", "Employment Type", "Work Setup",
+    "Willing to Relocate",
+]
+
+FOOTER_TEXT = (
+    "- Data provided by you via the SmartPredict AI interface.\n"
+    "- AI uses machine learning models, salary datasets, and pay equity best practices to forecast likely salaries for similar profiles in your region and industry.\n\n"
+    "All information is confidential and generated exclusively for you by SmartPredict AI."
+)
+
+CONTRIBUTIONS_NOTE = (
+    "Each amount is how much that detail moved the prediction away from the typical salary, "
+    "averaged over the decision trees in the model. Added to the typical salary, they give your prediction."
+)
+
+# Fixed positions (mm) of the static cards on page one.
+PREDICTION_CARD_Y = 46
+PROFILE_CARD_Y = 84
+PROFILE_ROWS_Y = 96
+PROFILE_ROW_HEIGHT = 8
+SKILLS_CARD_Y = PROFILE_ROWS_Y + PROFILE_ROW_HEIGHT * len(PROFILE_LABELS) + 2
+
+
+def prediction_text(predicted_usd):
+    lakhs_pa = max(0, predicted_usd * USD_TO_INR) / 100000
+    return f"₹ {lakhs_pa:.2f} Lakhs p.a."
+
+
+def interval_text(low_usd, high_usd):
+    """Describes the range the forest's trees agree on; empty when there is none."""
+    if math.isnan(low_usd) or math.isnan(high_usd):
+        return ""
+    low, high = (max(0, usd * USD_TO_INR) / 100000 for usd in (low_usd, high_usd))
+    coverage = round((INTERVAL_QUANTILES[1] - INTERVAL_QUANTILES[0]) * 100)
+    return f"{coverage}% range: ₹ {low:.2f} - {high:.2f} Lakhs p.a."
+
+
+def contribution_items(contributions_usd):
+    """(feature, lakhs p.a.) pairs, largest effect first; empty when there is no explanation."""
+    if any(math.isnan(usd) for usd in contributions_usd):
+        return []
+    items = [(column, usd * USD_TO_INR / 100000) for column, usd in zip(FEATURE_COLUMNS, contributions_usd)]
+    return sorted(items, key=lambda item: abs(item[1]), reverse=True)
+
+
+def contribution_text(baseline_usd, contributions_usd):
+    """One line for the baseline, then one per feature: how each moved the prediction."""
+    items = contribution_items(contributions_usd)
+    if not items or math.isnan(baseline_usd):
+        return ""
+    lines = [f"Typical salary before your details: ₹ {baseline_usd * USD_TO_INR / 100000:.2f} Lakhs p.a."]
+    lines += [f"{column}: {'+' if lakhs >= 0 else '-'}₹ {abs(lakhs):.2f} Lakhs" for column, lakhs in items]
+    return "\n".join(lines)
+
+
+def report_data_from_args(args):
+    """Collects the report fields from request query parameters."""
+    return {key: args.get(param, default) for key, param, default in REPORT_FIELDS}
+
+
+def normalize_report_data(report_data):
+    """The field values as drawn: runs of whitespace collapsed, missing fields defaulted."""
+    normalized = {key: ' '.join(str(report_data.get(key, default)).split())
+                  for key, _, default in REPORT_FIELDS}
+    # Multi-line fields keep their line breaks since they change the layout.
+    for key, _, default in REPORT_FIELDS:
+        if key in MULTILINE_FIELDS:
+            normalized[key] = str(report_data.get(key, default)).strip()
+    return normalized
+
+
+def report_cache_key(report_data):
+    """Content address of a report: the hash of its normalized fields."""
+    payload = json.dumps(normalize_report_data(report_data), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ReportPDF(FPDF):
+    def header(self):
+        # Main Banner
+        self.set_fill_color(76, 201, 240)
+        self.rect(0, 0, 210, 28, 'F')
+        self.set_text_color(255, 255, 255)
+        self.set_font("Helvetica", "B", 24)
+        self.set_xy(0, 10)
+        self.cell(0, 10, "Salary Prediction Report", align='C', ln=1)
+        # SmartPredict AI Stamp
+        self.set_font("Helvetica", "I", 11)
+        self.set_text_color(255, 255, 255)
+        self.set_xy(0, 20)
+        self.cell(0, 10, "Data provided by SmartPredict AI", align='C')
+        self.set_y(29)
+
+
+def build_template():
+    """Draws everything on page one that does not depend on the request."""
+    pdf = ReportPDF()
+    pdf.add_page()
+
+    # Faint "stamp"/credit at the bottom right corner. Drawn without the
+    # automatic page break so it stays on the first page.
+    pdf.set_auto_page_break(False)
+    pdf.set_xy(-80, 277)
+    pdf.set_font("Helvetica", "B", 10)
+    pdf.set_text_color(230, 230, 230)
+    pdf.cell(70, 9, "Generated by SmartPredict AI", ln=1, align='R')
+    pdf.set_auto_page_break(True, margin=20)
+
+    # Salary Prediction Card
+    pdf.set_draw_color(250, 190, 78)
+    pdf.set_fill_color(250, 232, 158)
+    pdf.rect(20, PREDICTION_CARD_Y, 170, 32, 'DF')
+    pdf.set_xy(20, PREDICTION_CARD_Y + 6)
+    pdf.set_text_color(43, 45, 66)
+    pdf.set_font("Helvetica", "B", 15)
+    pdf.cell(170, 8, "Your Predicted Annual Salary", ln=1, align='C')
+
+    # Profile Section
+    pdf.set_fill_color(236, 245, 252)
+    pdf.rect(14, PROFILE_CARD_Y, 182, 88, 'F')
+    pdf.set_xy(18, PROFILE_CARD_Y + 4)
+    pdf.set_text_color(54, 79, 107)
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(70, 8, "Candidate Profile", ln=1)
+    pdf.set_font("Helvetica", "", 12)
+    pdf.set_text_color(60, 68, 80)
+    for row, field in enumerate(PROFILE_LABELS):
+        pdf.set_xy(18, PROFILE_ROWS_Y + row * PROFILE_ROW_HEIGHT)
+        pdf.cell(60, 8, f"{field}:", border=0)
+
+    # Skills Section Card
+    pdf.set_fill_color(225, 250, 255)
+    pdf.rect(14, SKILLS_CARD_Y, 182, 16, 'F')
+    pdf.set_xy(18, SKILLS_CARD_Y + 3)
+    pdf.set_font("Helvetica", "B", 13)
+    pdf.set_text_color(24, 117, 163)
+    pdf.cell(0, 7, "Key Skills", ln=1)
+    return pdf
+
+
+def clone_document(pdf):
+    """Copies an FPDF document cheaply.
+
+    Page content is held as immutable strings, so copying the containers (and
+    the per-font/per-image dicts that output() annotates) is enough; this is
+    several times faster than deepcopy or pickling.
+    """
+    clone = copy.copy(pdf)
+    for name, value in vars(pdf).items():
+        if isinstance(value, dict):
+            setattr(clone, name, {key: dict(item) if isinstance(item, dict) else item
+                                  for key, item in value.items()})
+        elif isinstance(value, list):
+            setattr(clone, name, list(value))
+    return clone
+
+
+def fill_report(pdf, report_data):
+    """Draws the request-specific fields onto a template copy and returns the PDF bytes."""
+    draw_report(pdf, report_data)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+def draw_report(pdf, report_data):
+    """Lays out the request-specific fields on a template copy."""
+    # Drawn from the same values the cache key hashes, so reports that share
+    # a key are identical.
+    report_data = normalize_report_data(report_data)
+    # Prepared for
+    pdf.set_font("Helvetica", "", 13)
+    pdf.set_text_color(95, 95, 100)
+    pdf.set_xy(10, 33)
+    pdf.cell(0, 9, f"Prepared for: {report_data['user_name']} ({report_data['user_location']})", ln=1, align='C')
+
+    # Predicted salary
+    pdf.set_xy(10, PREDICTION_CARD_Y + 14)
+    pdf.set_font("Helvetica", "B", 26)
+    pdf.set_text_color(76, 201, 240)
+    pdf.cell(170, 12, report_data['prediction'].replace('₹', 'Rs.'), ln=1, align='C')
+    if report_data.get('interval'):
+        pdf.set_xy(20, PREDICTION_CARD_Y + 25)
+        pdf.set_font("Helvetica", "", 11)
+        pdf.set_text_color(95, 95, 100)
+        pdf.cell(170, 6, report_data['interval'].replace('₹', 'Rs.'), align='C')
+
+    # Profile values next to the template's labels
+    pdf.set_font("Helvetica", "", 12)
+    pdf.set_text_color(60, 68, 80)
+    profile_values = [
+        report_data['user_name'],
+        report_data['user_location'],
+        report_data['age'],
+        report_data['gender'],
+        report_data['education'],
+        report_data['job_title'],
+        f"{report_data['experience']} years",
+        report_data['country'],
+        report_data['industry'],
+        report_data['company_size'],
+        report_data['employment_type'],
+        report_data['remote'],
+        report_data['relocate'],
+    ]
+    for row, value in enumerate(profile_values):
+        pdf.set_xy(78, PROFILE_ROWS_Y + row * PROFILE_ROW_HEIGHT)
+        pdf.cell(0, 8, f"{value}", ln=1, border=0)
+
+    # Skills text inside the template's card
+    pdf.set_xy(18, SKILLS_CARD_Y + 10)
+    pdf.set_font("Helvetica", "", 12)
+    pdf.set_text_color(33, 40, 49)
+    pdf.multi_cell(174, 7, report_data['skills'])
+
+    pdf.ln(2)
+
+    # Certifications Section Card (its position depends on the skills text)
+    y = pdf.get_y()
+    pdf.set_x(14)
+    pdf.set_fill_color(250, 232, 158)
+    pdf.rect(14, y, 182, 16, 'F')
+    pdf.set_y(y + 3)
+    pdf.set_x(18)
+    pdf.set_font("Helvetica", "B", 13)
+    pdf.set_text_color(140, 100, 35)
+    pdf.cell(0, 7, "Certifications", ln=1)
+    pdf.set_x(18)
+    pdf.set_font("Helvetica", "", 12)
+    pdf.set_text_color(90, 55, 15)
+    pdf.multi_cell(174, 7, report_data['certifications'])
+    pdf.ln(2)
+
+    # Explanation & Confidentiality Footer
+    pdf.set_x(14)
+    pdf.set_font("Helvetica", "I", 11)
+    pdf.set_text_color(104, 123, 164)
+    pdf.multi_cell(0, 7, FOOTER_TEXT, align='L')
+
+    # Why this salary: how each profile field moved the prediction. Page one
+    # is full, so it gets a page of its own.
+    if report_data.get('contributions'):
+        pdf.add_page()
+        pdf.set_xy(18, 36)
+        pdf.set_font("Helvetica", "B", 15)
+        pdf.set_text_color(54, 79, 107)
+        pdf.cell(0, 8, "Why This Salary", ln=1)
+        pdf.set_x(18)
+        pdf.set_font("Helvetica", "", 12)
+        pdf.set_text_color(33, 40, 49)
+        pdf.multi_cell(174, 8, report_data['contributions'].replace('₹', 'Rs.'))
+        pdf.ln(2)
+        pdf.set_x(18)
+        pdf.set_font("Helvetica", "I", 11)
+        pdf.set_text_color(104, 123, 164)
+        pdf.multi_cell(174, 7, CONTRIBUTIONS_NOTE)
+
+
+class ReportRenderer:
+    """Renders reports from a prebuilt template with a size-bounded PDF cache."""
+
+    def __init__(self, cache_bytes=64 * 1024 * 1024):
+        self.cache = LRUCache(maxsize=cache_bytes, weigh=len)
+        self._template = None
+        self._lock = threading.Lock()
+
+    @property
+    def template(self):
+        if self._template is None:
+            with self._lock:
+                if self._template is None:
+                    self._template = build_template()
+        return self._template
+
+    def render(self, report_data):
+        """Returns the PDF bytes for a report, from the cache when possible."""
+        key = report_cache_key(report_data)
+        pdf_content = self.cache.get(key)
+        if pdf_content is None:
+            pdf_content = self.render_uncached(report_data)
+            self.cache.put(key, pdf_content)
+        return pdf_content
+
+    def render_uncached(self, report_data):
+        with metrics.stage('report', 'layout'):
+            pdf = clone_document(self.template)
+            draw_report(pdf, report_data)
+        with metrics.stage('report', 'output'):
+            return pdf.output(dest='S').encode('latin-1')
@@ -0,0 +1,198 @@
+# score.py
+#
+# Out-of-core batch scoring: reads a CSV or Parquet file of profiles in
+# fixed-size chunks, encodes and predicts each chunk vectorized (optionally on
+# several worker processes) and appends the results to the output as it goes,
+# so memory stays flat whatever the file size.
+#
+#   python score.py hr_extract.csv -o scored.csv
+#   python score.py hr_extract.parquet -o scored.parquet --workers 8 --chunk-rows 100000
+#
+# Every input column is kept; predicted_salary_usd, predicted_salary_inr,
+# lakhs_pa and error are appended. Rows that cannot be scored (unknown
+# category, non-numeric age...) get empty predictions and the reason in
+# 'error' instead of failing the run, unless --strict is given.
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from assets import FEATURE_COLUMNS, USD_TO_INR, SalaryAssets
+from encoding import UnknownCategoryError
+
+DEFAULT_CHUNK_ROWS = 50000
+
+
+def is_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+
+def iter_chunks(path, chunk_rows):
+    """Yields DataFrames of at most chunk_rows rows, reading the file lazily."""
+    if is_parquet(path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("🚨 Reading Parquet needs pyarrow (pip install pyarrow).")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        # Everything as text, so codes like '01' and blank cells survive the round trip.
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=False,
+                               encoding='utf-8-sig')
+
+
+def encode_chunk(feature_encoder, chunk):
+    """Returns (features, errors): the (n, 5) matrix and a per-row error message or None.
+
+    Categorical columns are encoded through their unique values, so the
+    per-value work does not grow with the row count.
+    """
+    n_rows = len(chunk)
+    features = np.zeros((n_rows, len(FEATURE_COLUMNS)), dtype=np.float64)
+    errors = np.full(n_rows, None, dtype=object)
+    for j, column in enumerate(FEATURE_COLUMNS):
+        if column not in chunk.columns:
+            errors[errors == None] = f"Missing column '{column}'."  # noqa: E711
+            continue
+        values = chunk[column]
+        if column in feature_encoder:
+            uniques, inverse = np.unique(values.astype(str).to_numpy(), return_inverse=True)
+            codes = np.zeros(len(uniques), dtype=np.float64)
+            messages = np.full(len(uniques), None, dtype=object)
+            for k, value in enumerate(uniques):
+                try:
+                    codes[k] = feature_encoder.encode(column, value)
+                except UnknownCategoryError as e:
+                    messages[k] = str(e)
+            features[:, j] = codes[inverse]
+            row_messages = messages[inverse]
+        else:
+            numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+            bad = ~np.isfinite(numbers)
+            features[:, j] = np.where(bad, 0.0, numbers)
+            row_messages = np.where(bad, f"Invalid {column}.", None)
+        first_error = (errors == None) & (row_messages != None)  # noqa: E711
+        errors[first_error] = row_messages[first_error]
+    return features, errors
+
+
+def score_chunk(assets, chunk):
+    """Appends the prediction columns to one chunk."""
+    features, errors = encode_chunk(assets.feature_encoder, chunk)
+    valid = errors == None  # noqa: E711
+    usd = np.full(len(chunk), np.nan)
+    if valid.any():
+        usd[valid] = assets.predict_usd(features[valid])
+    inr = np.maximum(usd * USD_TO_INR, 0)
+    scored = chunk.copy()
+    scored['predicted_salary_usd'] = np.round(usd, 2)
+    scored['predicted_salary_inr'] = np.round(inr, 2)
+    scored['lakhs_pa'] = np.round(inr / 100000, 2)
+    # A string dtype even for all-valid chunks, so every Parquet row group has the same schema.
+    scored['error'] = pd.array(errors, dtype='string')
+    return scored
+
+
+# --- Worker processes ---
+
+_assets = None
+
+
+def _init_worker():
+    global _assets
+    _assets = SalaryAssets.load(artifact_filename=os.environ.get('SALARY_ARTIFACT_PATH', 'salary_model.npz'),
+                                grid_filename=os.environ.get('SALARY_GRID_PATH', 'prediction_grid.npy'),
+                                cache_size=0)
+
+
+def _score_in_worker(chunk):
+    return score_chunk(_assets, chunk)
+
+
+def iter_scored(chunks, workers=1):
+    """Scores chunks in order, in this process or on a bounded process pool."""
+    if workers <= 1:
+        _init_worker()
+        for chunk in chunks:
+            yield score_chunk(_assets, chunk)
+        return
+
+    from bulk_reports import pool_context
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                             initializer=_init_worker) as executor:
+        # Two chunks per worker in flight keeps every core busy without
+        # reading ahead of the writer.
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_score_in_worker, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = is_parquet(path)
+        self._writer = None
+        self._first = True
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            frame.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of profiles in constant memory.")
+    parser.add_argument('input', help="CSV or Parquet with Age, Gender, Education Level, Job Title, Years of Experience")
+    parser.add_argument('-o', '--output', required=True, help="Output .csv or .parquet")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=1, help="Scoring processes (default: 1, in-process)")
+    parser.add_argument('--strict', action='store_true', help="Stop at the first row that cannot be scored")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    writer = ChunkWriter(args.output)
+    rows = failed = 0
+    try:
+        for scored in iter_scored(iter_chunks(args.input, args.chunk_rows), workers=args.workers):
+            bad = scored['error'].notna()
+            if args.strict and bad.any():
+                first = int(np.flatnonzero(bad.to_numpy())[0])
+                sys.exit(f"🚨 Row {rows + first + 1}: {scored['error'].iloc[first]}")
+            writer.write(scored)
+            rows += len(scored)
+            failed += int(bad.sum())
+            elapsed = time.perf_counter() - started
+            print(f"  {rows:,} rows scored ({rows / max(elapsed, 1e-9):,.0f} rows/s)", file=sys.stderr)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - started
+    print(f"✅ Scored {rows:,} rows into {args.output} in {elapsed:.1f}s"
+          + (f"; 🚨 {failed:,} rows could not be scored (see the 'error' column)" if failed else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# test_inference.py
+#
+# ForestEngine must return exactly model.predict(scaler.transform(X)): the
+# folded thresholds come from a search over float64 bit patterns, so a
+# scikit-learn or NumPy change in how the scaler or the trees round would
+# silently break it. Checked on random rows and on rows placed on, and one
+# ulp either side of, every folded threshold.
+
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler
+
+from inference import ForestEngine, unwrap_forest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(ROOT, 'salary_model.pkl')
+SCALER_PATH = os.path.join(ROOT, 'scaler1.pkl')
+
+
+def reference_predict(model, scaler, X):
+    return model.predict(scaler.transform(X))
+
+
+def random_rows(rng, n, low, high):
+    return rng.uniform(low, high, size=(n, len(low)))
+
+
+def threshold_rows(engine, rng, low, high):
+    """Rows on, just below and just above each folded split threshold, other features random."""
+    is_split = ~engine.is_leaf & np.isfinite(engine.threshold)
+    features = engine.feature[is_split]
+    thresholds = engine.threshold[is_split]
+    rows = []
+    for probe in (np.nextafter(thresholds, -np.inf), thresholds, np.nextafter(thresholds, np.inf)):
+        block = random_rows(rng, len(thresholds), low, high)
+        block[np.arange(len(thresholds)), features] = probe
+        rows.append(block)
+    return np.vstack(rows)
+
+
+def assert_bit_identical(engine, model, scaler, X):
+    expected = reference_predict(model, scaler, X)
+    actual = engine.predict(X)
+    mismatches = np.flatnonzero(actual.view(np.uint64) != expected.view(np.uint64))
+    assert mismatches.size == 0, f"{mismatches.size} of {len(X)} rows differ, first at rows {mismatches[:5]}"
+    # The other outputs share the traversal; their prediction column must agree too.
+    assert np.array_equal(engine.explain(X, (0.1, 0.9))[:, 0], expected)
+
+
+def synthetic_model(forest_class, seed):
+    rng = np.random.default_rng(seed)
+    # Skewed, differently scaled columns so the scaler's rounding matters.
+    X = np.column_stack([
+        rng.integers(18, 70, 600).astype(np.float64),
+        rng.integers(0, 3, 600).astype(np.float64),
+        rng.integers(0, 7, 600).astype(np.float64),
+        rng.lognormal(3.0, 1.0, 600),
+        rng.uniform(0.0, 40.0, 600).round(1),
+    ])
+    y = 20000 + 1500 * X[:, 4] + 300 * X[:, 0] * X[:, 2] + rng.normal(0, 5000, 600)
+    scaler = MinMaxScaler().fit(X)
+    forest = forest_class(n_estimators=25, random_state=seed, n_jobs=1)
+    model = Pipeline([('model', forest)]).fit(scaler.transform(X), y)
+    return model, scaler, X.min(axis=0), X.max(axis=0)
+
+
+@pytest.mark.parametrize('forest_class', [RandomForestRegressor, ExtraTreesRegressor])
+def test_engine_matches_pipeline_on_synthetic_forest(forest_class):
+    model, scaler, low, high = synthetic_model(forest_class, seed=7)
+    engine = ForestEngine.from_sklearn(model, scaler)
+    rng = np.random.default_rng(11)
+    span = high - low
+    assert_bit_identical(engine, model, scaler, random_rows(rng, 5000, low - span, high + span))
+    assert_bit_identical(engine, model, scaler, threshold_rows(engine, rng, low, high))
+
+
+@pytest.mark.skipif(not (os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH)),
+                    reason="trained model files not present")
+def test_engine_matches_pipeline_on_shipped_model():
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    # Parallel prediction sums the trees in thread order; the engine matches the single-job order.
+    unwrap_forest(model).set_params(n_jobs=1)
+    engine = ForestEngine.from_sklearn(model, scaler)
+    low = np.asarray(scaler.data_min_, dtype=np.float64)
+    high = np.asarray(scaler.data_max_, dtype=np.float64)
+    rng = np.random.default_rng(3)
+    rows = random_rows(rng, 5000, low, high)
+    # Encoded categories are whole numbers, as the app sends them.
+    rows[:, 1:4] = np.floor(rows[:, 1:4])
+    assert_bit_identical(engine, model, scaler, rows)
+    assert_bit_identical(engine, model, scaler, threshold_rows(engine, rng, low, high))
@@ -0,0 +1,289 @@
+# train.py
+#
+# Scripted version of the model selection in EMPLOYEE_PREDICTION_ML_MODEL.ipynb.
+# Every candidate regressor gets a K-fold grid search; all (candidate,
+# parameters, fold) fits run in parallel on all cores, and the MinMaxScaler fitted for a
+# fold is cached and reused for every parameter combination on that fold.
+# The best model by mean CV R2 is scored on a held-out split and written with
+# the scaler and label encoders as the three files main.py loads.
+#
+#   python train.py --data "Salary Data.csv" --jobs -1
+#   python train.py --models random_forest gradient_boosting --folds 10
+#
+# The pickles are replaced atomically, so a running server picks them up
+# through its model registry (see registry.py).
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import GridSearchCV, KFold, ParameterGrid, train_test_split
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+from sklearn.svm import SVR
+from sklearn.tree import DecisionTreeRegressor
+
+from assets import FEATURE_COLUMNS, LABEL_ENCODERS_FILENAME, MODEL_FILENAME, SCALER_FILENAME, model_version
+from drift import DEFAULT_REFERENCE_PATH, build_reference, save_reference
+from encoding import CATEGORICAL_COLUMNS
+from prediction_grid import asset_hashes
+
+try:
+    from xgboost import XGBRegressor
+except ImportError:
+    XGBRegressor = None
+
+TARGET_COLUMN = 'Salary'
+DEFAULT_REPORT_PATH = 'training_report.json'
+
+
+def candidate_models(seed=42):
+    """(estimator, parameter grid) per candidate; grids use the 'model__' pipeline prefix.
+
+    Estimators run single-threaded: the grid search already spreads the fits
+    over every core.
+    """
+    candidates = {
+        'linear_regression': (LinearRegression(), {}),
+        'decision_tree': (DecisionTreeRegressor(random_state=seed), {
+            'model__max_depth': [None, 5, 10, 20],
+            'model__min_samples_leaf': [1, 2, 5],
+        }),
+        'random_forest': (RandomForestRegressor(random_state=seed, n_jobs=1), {
+            'model__n_estimators': [100, 300],
+            'model__max_depth': [None, 10, 20],
+            'model__min_samples_leaf': [1, 2],
+        }),
+        'gradient_boosting': (GradientBoostingRegressor(random_state=seed), {
+            'model__n_estimators': [100, 300],
+            'model__learning_rate': [0.05, 0.1],
+            'model__max_depth': [3, 5],
+        }),
+        'k_neighbors': (KNeighborsRegressor(), {
+            'model__n_neighbors': [3, 5, 10],
+            'model__weights': ['uniform', 'distance'],
+        }),
+        'svr': (SVR(), {
+            'model__C': [1e3, 1e4, 1e5],
+            'model__gamma': ['scale', 0.5],
+        }),
+    }
+    if XGBRegressor is not None:
+        candidates['xgboost'] = (XGBRegressor(objective='reg:squarederror', random_state=seed, n_jobs=1), {
+            'model__n_estimators': [200, 400],
+            'model__max_depth': [3, 6],
+            'model__learning_rate': [0.05, 0.1],
+        })
+    return candidates
+
+
+def load_dataset(path):
+    """Reads the salary CSV and drops incomplete rows, as the notebook does."""
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    missing = [column for column in FEATURE_COLUMNS + [TARGET_COLUMN] if column not in df.columns]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+    return df[FEATURE_COLUMNS + [TARGET_COLUMN]].dropna().reset_index(drop=True)
+
+
+def encode_features(df):
+    """Fits one LabelEncoder per categorical column, once, on the whole dataset.
+
+    Encoding is a fixed lookup, so fitting it per fold would only repeat the
+    same work; every category must be known to the served encoders anyway.
+    """
+    label_encoders = {}
+    X = df[FEATURE_COLUMNS].copy()
+    for column in CATEGORICAL_COLUMNS:
+        encoder = LabelEncoder()
+        X[column] = encoder.fit_transform(X[column].astype(str))
+        label_encoders[column] = encoder
+    return X.astype(np.float64), df[TARGET_COLUMN].astype(np.float64), label_encoders
+
+
+def search_all(candidates, X_train, y_train, folds, jobs, cache_dir, seed=42):
+    """Grid-searches every candidate at once; returns per-candidate CV results.
+
+    All candidates go into one GridSearchCV (the pipeline's 'model' step is a
+    searched parameter), so every (candidate, parameters, fold) fit is
+    scheduled on the same worker pool instead of one candidate at a time.
+    """
+    cv = KFold(n_splits=folds, shuffle=True, random_state=seed)
+    param_grid = [dict(grid, model=[clone(estimator)]) for estimator, grid in candidates.values()]
+    # memory= caches the fitted scaler per fold, so it is fitted once per fold
+    # rather than once per (candidate, parameters, fold) fit.
+    pipeline = Pipeline([('scaler', MinMaxScaler()), ('model', LinearRegression())], memory=cache_dir)
+    search = GridSearchCV(pipeline, param_grid, scoring='r2', cv=cv, n_jobs=jobs, refit=False, error_score=np.nan)
+    started = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        search.fit(X_train, y_train)
+    print(f"✅ Searched {len(search.cv_results_['params'])} settings x {folds} folds "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    cv_results = search.cv_results_
+    scores = np.asarray(cv_results['mean_test_score'])
+    results = {}
+    offset = 0
+    # ParameterGrid enumerates the grids in order, one block per candidate.
+    for name, grid in zip(candidates, param_grid):
+        block = slice(offset, offset + len(ParameterGrid(grid)))
+        offset = block.stop
+        block_scores = scores[block]
+        fit_seconds = float(np.sum(cv_results['mean_fit_time'][block]) * folds)
+        if np.isnan(block_scores).all():
+            results[name] = {'error': 'every setting failed to fit'}
+            continue
+        best = block.start + int(np.nanargmax(block_scores))
+        results[name] = {
+            'best_params': {key.split('__', 1)[1]: value for key, value in cv_results['params'][best].items()
+                            if key != 'model'},
+            'cv_r2_mean': float(scores[best]),
+            'cv_r2_std': float(cv_results['std_test_score'][best]),
+            'fit_seconds': round(fit_seconds, 2),
+        }
+    return results
+
+
+def fit_final(estimator, params, scaler, X, y):
+    """Fits the served model: a model-only Pipeline on externally scaled features."""
+    model = clone(estimator).set_params(**params)
+    if 'n_jobs' in model.get_params():
+        # Predict on all cores, as the notebook's models did.
+        model.set_params(n_jobs=-1)
+    pipeline = Pipeline([('model', model)])
+    pipeline.fit(scaler.transform(X), y)
+    return pipeline
+
+
+def regression_metrics(y_true, y_pred):
+    return {
+        'mae': float(mean_absolute_error(y_true, y_pred)),
+        'mse': float(mean_squared_error(y_true, y_pred)),
+        'r2': float(r2_score(y_true, y_pred)),
+    }
+
+
+def dump_atomic(value, path):
+    """Writes a pickle next to its destination and renames it into place."""
+    partial = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(value, partial)
+    os.replace(partial, path)
+
+
+def train(data_path, out_dir='.', models=None, folds=5, jobs=-1, test_size=0.2, seed=42,
+          report_path=DEFAULT_REPORT_PATH):
+    started = time.perf_counter()
+    df = load_dataset(data_path)
+    X, y, label_encoders = encode_features(df)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=seed)
+
+    candidates = candidate_models(seed)
+    if models:
+        unknown = set(models) - set(candidates)
+        if unknown:
+            raise ValueError(f"Unknown or unavailable models: {', '.join(sorted(unknown))}")
+        candidates = {name: candidates[name] for name in models}
+
+    cache_dir = tempfile.mkdtemp(prefix='salary-train-')
+    try:
+        results = search_all(candidates, X_train, y_train, folds, jobs, cache_dir, seed)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # Scaler fitted on the training split only; the test split stays unseen.
+    scaler = MinMaxScaler().fit(X_train)
+    models = {}
+    for name, result in results.items():
+        if 'error' in result:
+            continue
+        models[name] = fit_final(candidates[name][0], result['best_params'], scaler, X_train, y_train)
+        result['test'] = regression_metrics(y_test, models[name].predict(scaler.transform(X_test)))
+
+    ranked = sorted(models,
+                    key=lambda name: results[name]['cv_r2_mean'], reverse=True)
+    if not ranked:
+        raise RuntimeError("No candidate model could be fitted.")
+    best = ranked[0]
+
+    os.makedirs(out_dir, exist_ok=True)
+    dump_atomic(label_encoders, os.path.join(out_dir, LABEL_ENCODERS_FILENAME))
+    dump_atomic(scaler, os.path.join(out_dir, SCALER_FILENAME))
+    # The model goes last: the registry reloads once all three have settled.
+    dump_atomic(models[best], os.path.join(out_dir, MODEL_FILENAME))
+
+    # What live traffic is compared against (see drift.py): every row, as the model sees it.
+    hashes = asset_hashes(*(os.path.join(out_dir, name)
+                            for name in (MODEL_FILENAME, SCALER_FILENAME, LABEL_ENCODERS_FILENAME)))
+    vocabularies = {column: encoder.classes_ for column, encoder in label_encoders.items()}
+    reference = build_reference(X.to_numpy(), models[best].predict(scaler.transform(X)), vocabularies,
+                                FEATURE_COLUMNS, version=model_version(hashes))
+    save_reference(reference, os.path.join(out_dir, DEFAULT_REFERENCE_PATH))
+
+    report = {
+        'data': os.path.abspath(data_path),
+        'rows': len(df),
+        'train_rows': len(X_train),
+        'test_rows': len(X_test),
+        'folds': folds,
+        'best_model': best,
+        'models': {name: results[name] for name in ranked + [name for name in results if name not in ranked]},
+        'seconds': round(time.perf_counter() - started, 2),
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    if report_path:
+        with open(report_path, 'w') as handle:
+            json.dump(report, handle, indent=2, default=str)
+    return report
+
+
+def print_report(report):
+    print(f"\n📊 Model comparison ({report['rows']} rows, {report['folds']}-fold CV, ranked by CV R2):")
+    print(f"{'model':<20}{'CV R2':>10}{'± std':>9}{'test R2':>10}{'test MAE':>12}{'fit s':>10}")
+    for name, result in report['models'].items():
+        if 'error' in result:
+            print(f"{name:<20}  {result['error']}")
+            continue
+        print(f"{name:<20}{result['cv_r2_mean']:>10.4f}{result['cv_r2_std']:>9.4f}"
+              f"{result['test']['r2']:>10.4f}{result['test']['mae']:>12.1f}{result['fit_seconds']:>10.1f}")
+    print(f"\n✅ Best model '{report['best_model']}' saved as '{MODEL_FILENAME}' "
+          f"(with '{SCALER_FILENAME}', '{LABEL_ENCODERS_FILENAME}' and '{DEFAULT_REFERENCE_PATH}') "
+          f"in {report['seconds']:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and select the salary model.")
+    parser.add_argument('--data', default='Salary Data.csv')
+    parser.add_argument('--out-dir', default='.', help="Where to write the three model files")
+    parser.add_argument('--models', nargs='+', default=None,
+                        help="Candidates to try (default: all; xgboost only when installed)")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=-1, help="Parallel fits (default: all cores)")
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--report', default=DEFAULT_REPORT_PATH, help="Metrics report JSON path")
+    args = parser.parse_args()
+
+    if XGBRegressor is None:
+        print("🚨 WARNING: xgboost is not installed; skipping the XGBoost candidate.")
+    report = train(args.data, out_dir=args.out_dir, models=args.models, folds=args.folds,
+                   jobs=args.jobs, test_size=args.test_size, seed=args.seed, report_path=args.report)
+    print_report(report)
+    print("Next: 'python model_artifact.py' to refresh the .npz artifact, and "
+          "'python registry.py --record-checks' once the new model is accepted.")
+
+
+if __name__ == '__main__':
+    main()